@@ -1,6 +1,10 @@
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
 from assembler.parser import Parser
+from assembler.sourcemap import SourceMap
 from assembler.symbols import SymbolTable
-from assembler.expressions import Label
+from assembler.expressions import Expression, Label
 
 
 DEFAULT_SYMBOLS = {
@@ -30,7 +34,7 @@ DEFAULT_SYMBOLS = {
 }
 
 
-def create_table(parser: Parser) -> SymbolTable:
+def create_table(parser: Iterable[Expression]) -> SymbolTable:
     table = SymbolTable(DEFAULT_SYMBOLS)
     line = 0
     for expr in parser:
@@ -40,18 +44,43 @@ def create_table(parser: Parser) -> SymbolTable:
             line += 1
     return table
 
-def assemble(inf: str, outf: str) -> None:
-    parser = Parser(inf)
+def encode(
+    parser: Parser,
+    source_map: Optional[SourceMap] = None,
+    source: str = ''
+) -> Iterator[str]:
     symbols = create_table(parser)
-    f = open(outf, 'w')
+    address = 0
     for expr in parser:
         out = expr.translate(symbols)
         if out:
+            if source_map is not None:
+                source_map.add(address, source, parser.line)
+            address += 1
+            yield out
+
+def assemble(inf: str, outf: str, source_map: bool = False) -> None:
+    rom_map = SourceMap() if source_map else None
+    with open(outf, 'w') as f:
+        for out in encode(Parser(inf), rom_map, Path(inf).name):
             f.write(out + '\n')
+    if rom_map is not None:
+        rom_map.write_to(Path(outf + '.map'))
 
 
 if __name__ == '__main__':
     import sys
-    infile = sys.argv[1]
-    outfile = infile[:-4] + '.hack'
-    assemble(infile, outfile)
\ No newline at end of file
+    args = sys.argv[1:]
+    if '--link' in args:
+        # main.py a.asm b.asm ... --link out.hack: each file is assembled
+        # to an object of its own, only if changed, and they are linked in
+        # the order given
+        from assembler.objects import build
+        outfile = args[args.index('--link') + 1]
+        sources = [arg for arg in args if arg.endswith('.asm')]
+        for source in build(sources, outfile, '--map' in args):
+            print('assembled {}'.format(source))
+    else:
+        infile = sys.argv[1]
+        outfile = infile[:-4] + '.hack'
+        assemble(infile, outfile, '--map' in sys.argv[2:])
\ No newline at end of file
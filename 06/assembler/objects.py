@@ -0,0 +1,203 @@
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from assembler.main import DEFAULT_SYMBOLS
+from assembler.parser import LineParser, Parser
+from assembler.sourcemap import SourceMap, read_vlq, write_vlq
+from assembler.symbols import SymbolTable
+from assembler.expressions import ACommand, Label
+
+
+class ObjectFile:
+    # one assembled piece of a program: its words, with a relocation for
+    # every A-instruction naming a symbol that isn't predefined, and the
+    # labels it defines as offsets into its words. source is the .asm it
+    # came from and checksum its text, to tell when it has to be redone.
+    MAGIC = b'HOB1'
+
+    def __init__(
+        self,
+        source: str,
+        checksum: int,
+        words: List[int],
+        lines: List[int],
+        labels: Dict[str, int],
+        relocations: List[Tuple[int, str]]
+    ) -> None:
+        self.source = source
+        self.checksum = checksum
+        self.words = words
+        # the source line of each word
+        self.lines = lines
+        self.labels = labels
+        self.relocations = relocations
+
+    def to_bytes(self) -> bytes:
+        out = bytearray(self.MAGIC)
+        out.extend(self.checksum.to_bytes(4, 'little'))
+        strings = [self.source] + list(self.labels) + sorted(set(s for o, s in self.relocations))
+        ids = dict((string, i) for i, string in enumerate(dict.fromkeys(strings)))
+        write_vlq(out, len(ids))
+        for string in ids:
+            encoded = string.encode()
+            write_vlq(out, len(encoded))
+            out.extend(encoded)
+
+        write_vlq(out, len(self.words))
+        out.extend(array('H', self.words).tobytes())
+        last = 0
+        for line in self.lines:
+            write_vlq(out, line - last)
+            last = line
+        write_vlq(out, len(self.labels))
+        for label, offset in self.labels.items():
+            write_vlq(out, ids[label])
+            write_vlq(out, offset)
+        write_vlq(out, len(self.relocations))
+        last = 0
+        for offset, symbol in self.relocations:
+            write_vlq(out, offset - last)
+            write_vlq(out, ids[symbol])
+            last = offset
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'ObjectFile':
+        if data[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError('Not an object file.')
+        pos = len(cls.MAGIC)
+        checksum = int.from_bytes(data[pos:pos + 4], 'little')
+        pos += 4
+        count, pos = read_vlq(data, pos)
+        strings = []
+        for i in range(count):
+            length, pos = read_vlq(data, pos)
+            strings.append(data[pos:pos + length].decode())
+            pos += length
+
+        count, pos = read_vlq(data, pos)
+        words = array('H')
+        words.frombytes(data[pos:pos + 2 * count])
+        pos += 2 * count
+        lines = []
+        line = 0
+        for i in range(count):
+            delta, pos = read_vlq(data, pos)
+            line += delta
+            lines.append(line)
+        labels = {}
+        count, pos = read_vlq(data, pos)
+        for i in range(count):
+            label, pos = read_vlq(data, pos)
+            labels[strings[label]], pos = read_vlq(data, pos)
+        relocations = []
+        count, pos = read_vlq(data, pos)
+        offset = 0
+        for i in range(count):
+            delta, pos = read_vlq(data, pos)
+            symbol, pos = read_vlq(data, pos)
+            offset += delta
+            relocations.append((offset, strings[symbol]))
+        return cls(strings[0], checksum, list(words), lines, labels, relocations)
+
+    def write_to(self, path: Path) -> None:
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: Path) -> 'ObjectFile':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+def checksum(text: str) -> int:
+    return zlib.crc32(text.encode())
+
+
+def assemble_object(parser: Parser, source: str = '', text_checksum: int = 0) -> ObjectFile:
+    # symbols are left to the linker, apart from the predefined ones
+    predefined = SymbolTable(DEFAULT_SYMBOLS)
+    words = []
+    lines = []
+    labels = {}
+    relocations = []
+    for expr in parser:
+        if isinstance(expr, Label):
+            labels[expr.get_label()] = len(words)
+            continue
+        symbol = expr.expr[1:] if isinstance(expr, ACommand) else ''
+        if symbol and not symbol[0].isdigit() and symbol not in DEFAULT_SYMBOLS:
+            relocations.append((len(words), symbol))
+            words.append(0)
+        else:
+            words.append(int(expr.translate(predefined), 2))
+        lines.append(parser.line)
+    return ObjectFile(source, text_checksum, words, lines, labels, relocations)
+
+
+def link(objects: Sequence[ObjectFile], source_map: Optional[SourceMap] = None) -> Iterator[str]:
+    # objects are laid out in order. a symbol resolves to a label of the
+    # object using it if it has one, then to the label of that name in the
+    # other objects, and otherwise is a variable, allocated from 16 in
+    # order of first use as by the assembler.
+    bases = []
+    exported = {}
+    address = 0
+    for obj in objects:
+        bases.append(address)
+        for label, offset in obj.labels.items():
+            exported.setdefault(label, []).append(address + offset)
+        address += len(obj.words)
+
+    variables = SymbolTable({})
+    for obj, base in zip(objects, bases):
+        words = list(obj.words)
+        for offset, symbol in obj.relocations:
+            if symbol in obj.labels:
+                words[offset] = base + obj.labels[symbol]
+            elif symbol in exported:
+                if len(exported[symbol]) > 1:
+                    raise ValueError('{} uses label {}, which more than one object defines.'.format(
+                        obj.source, symbol
+                    ))
+                words[offset] = exported[symbol][0]
+            else:
+                words[offset] = variables.address_for_symbol(symbol)
+        for offset, word in enumerate(words):
+            if source_map is not None:
+                source_map.add(base + offset, obj.source, obj.lines[offset])
+            yield '{:016b}'.format(word)
+
+
+def build(sources: Sequence[str], outf: str, source_map: bool = False) -> List[str]:
+    # assembles each source to an object next to it, unless the object
+    # there is from the same text, and links them all to outf. returns the
+    # sources that were assembled.
+    objects = []
+    assembled = []
+    for source in sources:
+        with open(source) as f:
+            lines = f.read().splitlines()
+        text_checksum = checksum('\n'.join(lines))
+        path = Path(source).with_suffix('.obj')
+        obj = None
+        if path.exists():
+            try:
+                obj = ObjectFile.load(path)
+            except ValueError:
+                pass
+        if obj is None or obj.checksum != text_checksum or obj.source != Path(source).name:
+            obj = assemble_object(LineParser(lines), Path(source).name, text_checksum)
+            obj.write_to(path)
+            assembled.append(source)
+        objects.append(obj)
+
+    rom_map = SourceMap() if source_map else None
+    with open(outf, 'w') as f:
+        for out in link(objects, rom_map):
+            f.write(out + '\n')
+    if rom_map is not None:
+        rom_map.write_to(Path(outf + '.map'))
+    return assembled
@@ -1,5 +1,5 @@
 import re
-from typing import Iterator, Optional
+from typing import Iterable, Iterator, Optional
 
 from assembler.expressions import Empty, Label, ACommand, CCommand, Expression
 
@@ -10,10 +10,14 @@ class Parser():
 
     def __iter__(self) -> Iterator[Expression]:
         self.f.seek(0)
+        self.next_line = 0
         return self
 
     def __next__(self) -> Expression:
         for line in self.f:
+            # source line (0-based) of the expression returned
+            self.line = self.next_line
+            self.next_line += 1
             expr = self.parseExpression(line) 
             if isinstance(expr, Empty):
                 return self.__next__()
@@ -30,4 +34,15 @@ class Parser():
         elif expr.startswith('@'):
             return ACommand(expr)
         else:
-            return CCommand(expr)
\ No newline at end of file
+            return CCommand(expr)
+
+
+class LineParser(Parser):
+    # assembly already in memory, e.g. straight from the vm translator
+    def __init__(self, lines: Iterable[str]) -> None:
+        self.lines = list(lines)
+
+    def __iter__(self) -> Iterator[Expression]:
+        self.f = iter(self.lines)
+        self.next_line = 0
+        return self
@@ -3,7 +3,7 @@ from typing import Dict, Optional
 class SymbolTable():
     def __init__(self, defaults: Dict[str, int]) -> None:
         self.next_variable = 16
-        self.table = defaults
+        self.table = dict(defaults)
 
     def address_for_symbol(self, symbol: str) -> int:
         if symbol not in self.table:
@@ -0,0 +1,107 @@
+import zlib
+from array import array
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict
+
+from assembler.expressions import OPS, DEST, JUMPS
+
+
+WORDS = 0x10000
+
+# comp ids: the assembler's mnemonics in its order, then the encodings
+# without a mnemonic
+COMP_CODES = list(OPS.values()) + sorted(set(range(0x80)) - set(OPS.values()))
+COMP_NAMES = list(OPS) + ['{:07b}'.format(code) for code in COMP_CODES[len(OPS):]]
+DEST_NAMES = dict((code, dest) for dest, code in DEST.items())
+JUMP_NAMES = dict((code, jump) for jump, code in JUMPS.items())
+
+CACHE = Path(__file__).parent / 'decode.table'
+
+
+class DecodeTable:
+    # every word decoded, in arrays indexed by the word: whether it is a
+    # c-instruction, and if so its comp id, dest bits and jump bits. stored
+    # with a checksum of the assembler's tables it was built from, so a
+    # stale one is never used.
+    MAGIC = b'HDT1'
+    FIELDS = ('kind', 'comp', 'dest', 'jump')
+
+    def __init__(self, kind: array, comp: array, dest: array, jump: array) -> None:
+        self.kind = kind
+        self.comp = comp
+        self.dest = dest
+        self.jump = jump
+
+    @staticmethod
+    def source_id() -> int:
+        return zlib.crc32(repr((OPS, DEST, JUMPS)).encode())
+
+    @classmethod
+    def build(cls) -> 'DecodeTable':
+        ids = dict((code, i) for i, code in enumerate(COMP_CODES))
+        half = WORDS // 2
+        c_words = range(half, WORDS)
+        return cls(
+            array('B', bytes(half) + b'\x01' * half),
+            array('B', bytes(half) + bytes(ids[(word >> 6) & 0x7F] for word in c_words)),
+            array('B', bytes(half) + bytes((word >> 3) & 0b111 for word in c_words)),
+            array('B', bytes(half) + bytes(word & 0b111 for word in c_words))
+        )
+
+    def to_bytes(self) -> bytes:
+        header = self.MAGIC + self.source_id().to_bytes(4, 'little')
+        return header + b''.join(getattr(self, field).tobytes() for field in self.FIELDS)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'DecodeTable':
+        if data[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError('Not a decode table.')
+        pos = len(cls.MAGIC)
+        if int.from_bytes(data[pos:pos + 4], 'little') != cls.source_id():
+            raise ValueError('Decode table was built from different instruction tables.')
+        pos += 4
+        if len(data) != pos + WORDS * len(cls.FIELDS):
+            raise ValueError('Decode table is truncated.')
+        fields = []
+        for i in range(len(cls.FIELDS)):
+            fields.append(array('B', data[pos + i * WORDS:pos + (i + 1) * WORDS]))
+        return cls(*fields)
+
+    def write_to(self, path: Path) -> None:
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: Path) -> 'DecodeTable':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def arrays(self) -> Dict[str, object]:
+        # the fields as numpy arrays, for decoding many words at once
+        import numpy as np
+        return dict((field, np.frombuffer(getattr(self, field), dtype=np.uint8)) for field in self.FIELDS)
+
+    def disassemble(self, word: int) -> str:
+        if not self.kind[word]:
+            return '@{}'.format(word)
+        dest, jump = DEST_NAMES[self.dest[word]], JUMP_NAMES[self.jump[word]]
+        return '{}{}{}'.format(
+            dest + '=' if dest else '', COMP_NAMES[self.comp[word]], ';' + jump if jump else ''
+        )
+
+
+@lru_cache(maxsize=None)
+def decode_table(path: Path = CACHE) -> DecodeTable:
+    # loaded from path, or built and saved there if it is missing or stale;
+    # if it can't be saved it is simply built again next time
+    try:
+        return DecodeTable.load(path)
+    except (OSError, ValueError):
+        pass
+    table = DecodeTable.build()
+    try:
+        table.write_to(path)
+    except OSError:
+        pass
+    return table
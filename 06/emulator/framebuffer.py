@@ -0,0 +1,71 @@
+import struct
+import zlib
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+
+SCREEN = 16384
+WIDTH = 512
+HEIGHT = 256
+WORDS_PER_ROW = WIDTH // 16
+
+
+class Framebuffer:
+    # the screen memory map as a HEIGHT x WIDTH array of 0/1 pixels, with
+    # pixel x of a row in bit x % 16 of word x // 16
+    def __init__(self, ram: List[int]) -> None:
+        self.ram = ram
+        self.words = np.zeros((HEIGHT, WORDS_PER_ROW), dtype='<u2')
+        self.pixels = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+        self.frames = 0
+
+    def read(self) -> np.ndarray:
+        words = np.array(self.ram[SCREEN:SCREEN + HEIGHT * WORDS_PER_ROW], dtype='<u2')
+        return words.reshape(HEIGHT, WORDS_PER_ROW)
+
+    def dirty_rows(self, words: np.ndarray) -> np.ndarray:
+        return np.flatnonzero((words != self.words).any(axis=1))
+
+    def update(self) -> bool:
+        # re-renders the rows whose words changed since the last update;
+        # returns whether anything did
+        words = self.read()
+        rows = self.dirty_rows(words)
+        if not len(rows):
+            return False
+        changed = np.ascontiguousarray(words[rows])
+        self.pixels[rows] = np.unpackbits(
+            changed.view(np.uint8), axis=1, bitorder='little'
+        )
+        self.words = words
+        self.frames += 1
+        return True
+
+    def to_pbm(self) -> bytes:
+        # 1 is black in both hack and pbm
+        header = 'P4\n{} {}\n'.format(WIDTH, HEIGHT).encode()
+        return header + np.packbits(self.pixels, axis=1).tobytes()
+
+    def to_png(self) -> bytes:
+        # 1 bit greyscale, where 0 is black
+        rows = np.packbits(1 - self.pixels, axis=1)
+        raw = np.hstack([np.zeros((HEIGHT, 1), dtype=np.uint8), rows]).tobytes()
+
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return (
+                struct.pack('>I', len(data)) + kind + data +
+                struct.pack('>I', zlib.crc32(kind + data))
+            )
+
+        return (
+            b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', struct.pack('>IIBBBBB', WIDTH, HEIGHT, 1, 0, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(raw)) +
+            chunk(b'IEND', b'')
+        )
+
+    def write_to(self, path: Path) -> None:
+        with open(path, 'wb') as f:
+            f.write(self.to_png() if path.suffix == '.png' else self.to_pbm())
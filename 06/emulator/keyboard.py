@@ -0,0 +1,75 @@
+from bisect import bisect_right
+from pathlib import Path
+from typing import List, Tuple
+
+from emulator.machine import Machine
+
+
+KBD = 24576
+
+KEYS = {
+    'none': 0,
+    'space': 32,
+    'newline': 128,
+    'enter': 128,
+    'backspace': 129,
+    'left': 130,
+    'up': 131,
+    'right': 132,
+    'down': 133,
+    'home': 134,
+    'end': 135,
+    'pageup': 136,
+    'pagedown': 137,
+    'insert': 138,
+    'delete': 139,
+    'esc': 140,
+}
+KEYS.update(('f{}'.format(n), 140 + n) for n in range(1, 13))
+
+
+def key_code(key: str) -> int:
+    if len(key) == 1:
+        return ord(key)
+    elif key.lower() in KEYS:
+        return KEYS[key.lower()]
+    return int(key)
+
+
+class KeyScript:
+    # keys held in KBD from a given cycle on, e.g.
+    #   1000 a        // press a
+    #   6000 none     // release it
+    #   9000 enter
+    # applied between runs, so the same script always hits the program at
+    # the same instruction
+    def __init__(self, events: List[Tuple[int, int]]) -> None:
+        events = sorted(events)
+        self.cycles = [cycle for cycle, code in events]
+        self.codes = [code for cycle, code in events]
+
+    @classmethod
+    def parse(cls, lines: List[str]) -> 'KeyScript':
+        events = []
+        for line in lines:
+            line = line.split('//')[0].strip()
+            if line:
+                cycle, key = line.split(None, 1)
+                events.append((int(cycle), key_code(key.strip())))
+        return cls(events)
+
+    @classmethod
+    def load(cls, path: Path) -> 'KeyScript':
+        with open(path) as f:
+            return cls.parse(f.read().splitlines())
+
+    def run(self, machine: Machine, cycles: int) -> int:
+        start = machine.cycles
+        end = start + cycles
+        while machine.cycles < end and not machine.halted:
+            i = bisect_right(self.cycles, machine.cycles)
+            if i:
+                machine.ram[KBD] = self.codes[i - 1]
+            stop = self.cycles[i] if i < len(self.cycles) else end
+            machine.run(min(stop, end) - machine.cycles)
+        return machine.cycles - start
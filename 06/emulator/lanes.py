@@ -0,0 +1,89 @@
+import struct
+import zlib
+from typing import List
+
+import numpy as np
+
+from emulator.machine import RAM_SIZE, ADDRESS_MASK
+
+
+class Lanes:
+    # many independent machines run in lock-step, one lane per program: a
+    # cycle decodes and executes the current instruction of every lane with
+    # array operations, so the interpreter overhead is paid once per cycle
+    # rather than once per lane. lanes are halted the same way Machine
+    # halts, on running off the rom or on the `(END) @END 0;JMP` loop.
+    def __init__(self, roms: List[List[int]]) -> None:
+        self.count = len(roms)
+        self.sizes = np.array([len(rom) for rom in roms], dtype=np.int64)
+        # one spare word, so a lane past the end of its rom still decodes
+        self.rom = np.zeros((self.count, max(self.sizes) + 1), dtype=np.int64)
+        for lane, rom in enumerate(roms):
+            self.rom[lane, :len(rom)] = rom
+        self.last = self.rom.shape[1] - 1
+        self.lane = np.arange(self.count)
+        self.ram = np.zeros((self.count, RAM_SIZE), dtype=np.uint16)
+        # ram and rom are addressed through flat views, which index faster
+        self.base = self.lane * RAM_SIZE
+        self.flat_ram = self.ram.reshape(-1)
+        self.flat_rom = self.rom.reshape(-1)
+        self.rom_base = self.lane * self.rom.shape[1]
+        self.reset()
+
+    def reset(self) -> None:
+        self.pc = np.zeros(self.count, dtype=np.int64)
+        self.a = np.zeros(self.count, dtype=np.int64)
+        self.d = np.zeros(self.count, dtype=np.int64)
+        self.cycles = np.zeros(self.count, dtype=np.int64)
+        self.halted = self.sizes == 0
+
+    def step(self) -> None:
+        pc, a, d = self.pc, self.a, self.d
+        running = ~self.halted
+        instruction = self.flat_rom[self.rom_base + np.minimum(pc, self.last)]
+        is_c = (instruction & 0x8000) != 0
+        address = self.base + (a & ADDRESS_MASK)
+
+        # the alu, from the zx/nx/zy/ny/f/no bits
+        m = self.flat_ram[address].astype(np.int64)
+        x = np.where(instruction & 0x0800, 0, d)
+        x = np.where(instruction & 0x0400, ~x & 0xFFFF, x)
+        y = np.where(instruction & 0x1000, m, a)
+        y = np.where(instruction & 0x0200, 0, y)
+        y = np.where(instruction & 0x0100, ~y & 0xFFFF, y)
+        out = np.where(instruction & 0x0080, (x + y) & 0xFFFF, x & y)
+        out = np.where(instruction & 0x0040, ~out & 0xFFFF, out)
+
+        negative = (out & 0x8000) != 0
+        zero = out == 0
+        jump = is_c & (
+            ((instruction & 0b100) != 0) & negative |
+            ((instruction & 0b010) != 0) & zero |
+            ((instruction & 0b001) != 0) & ~negative & ~zero
+        )
+
+        write = running & is_c & ((instruction & 0b001000) != 0)
+        self.flat_ram[address[write]] = out[write]
+        self.d = np.where(running & is_c & ((instruction & 0b010000) != 0), out, d)
+
+        halting = running & jump & (a == pc - 1) & (self.flat_rom[self.rom_base + np.minimum(a, self.last)] == a)
+        next_pc = np.where(jump, a, pc + 1)
+        self.pc = np.where(running, next_pc, pc)
+        next_a = np.where(is_c, np.where(instruction & 0b100000, out, a), instruction)
+        self.a = np.where(running, next_a, a)
+        self.cycles += running
+        self.halted = self.halted | halting | (self.pc >= self.sizes)
+
+    def run(self, cycles: int) -> int:
+        executed = 0
+        while executed < cycles and not self.halted.all():
+            self.step()
+            executed += 1
+        return executed
+
+    def digest(self, lane: int) -> str:
+        # the same digest Machine gives for the same state
+        registers = struct.pack(
+            '<HHHQ', self.pc[lane], self.a[lane], self.d[lane], self.cycles[lane]
+        )
+        return '{:08x}'.format(zlib.crc32(registers + self.ram[lane].astype('<u2').tobytes()))
@@ -0,0 +1,299 @@
+import struct
+import zlib
+from array import array
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+from assembler.expressions import OPS, JUMPS
+from emulator.decode import COMP_CODES, WORDS, decode_table
+
+
+RAM_SIZE = 32768
+ADDRESS_MASK = 0x7FFF
+PAGE_SIZE = 256
+
+
+def comp_function(mnemonic: str) -> Callable[[int, int, int], int]:
+    # the assembler's mnemonics are already valid python once the registers
+    # are renamed and ! becomes ~
+    expr = mnemonic.replace('D', 'd').replace('A', 'a').replace('M', 'm').replace('!', '~')
+    return eval('lambda d, a, m: ({}) & 0xFFFF'.format(expr))
+
+
+def alu_function(comp: int) -> Callable[[int, int, int], int]:
+    # fallback for the comp encodings without a mnemonic, straight from the
+    # zx/nx/zy/ny/f/no bits
+    def alu(d: int, a: int, m: int) -> int:
+        x = d
+        y = m if comp & 0b1000000 else a
+        if comp & 0b100000:
+            x = 0
+        if comp & 0b10000:
+            x = ~x & 0xFFFF
+        if comp & 0b1000:
+            y = 0
+        if comp & 0b100:
+            y = ~y & 0xFFFF
+        out = (x + y) & 0xFFFF if comp & 0b10 else x & y
+        if comp & 0b1:
+            out = ~out & 0xFFFF
+        return out
+    return alu
+
+
+def jump_function(jump: int) -> Optional[Callable[[int], bool]]:
+    if jump == JUMPS['']:
+        return None
+    lt, eq, gt = jump & 0b100, jump & 0b10, jump & 0b1
+    return lambda v: bool((lt and v & 0x8000) or (eq and v == 0) or (gt and 0 < v < 0x8000))
+
+
+COMP = dict((code, comp_function(mnemonic)) for mnemonic, code in OPS.items())
+JUMP = dict((code, jump_function(code)) for code in JUMPS.values())
+
+
+# an a-instruction decodes to its value, a c-instruction to
+# (comp, reads M, dest bits, jump test)
+Decoded = Union[int, Tuple[Callable[[int, int, int], int], bool, int, Optional[Callable[[int], bool]]]]
+
+
+@lru_cache(maxsize=None)
+def decoded_words() -> List[Decoded]:
+    # all words decoded from the decode table, once; a c-instruction's
+    # decoding is shared by every word with the same comp, dest and jump
+    table = decode_table()
+    comps = [COMP[code] if code in COMP else alu_function(code) for code in COMP_CODES]
+    shared = {}
+    words = list(range(WORDS // 2))
+    for word in range(WORDS // 2, WORDS):
+        fields = (table.comp[word], table.dest[word], table.jump[word])
+        if fields not in shared:
+            comp, dest, jump = fields
+            shared[fields] = (comps[comp], bool(COMP_CODES[comp] & 0b1000000), dest, JUMP[jump])
+        words.append(shared[fields])
+    return words
+
+
+def decode(word: int) -> Decoded:
+    return decoded_words()[word]
+
+
+class Trap:
+    # runs handler(ram) in place of the instruction at its address; the
+    # handler returns the next pc, or None to halt
+    def __init__(self, handler: Callable[[List[int]], Optional[int]]) -> None:
+        self.handler = handler
+
+
+def load_hack(path: Path) -> List[int]:
+    with open(path) as f:
+        return [int(line, 2) for line in f.read().split()]
+
+
+def rom_id(rom: List[int]) -> int:
+    return zlib.crc32(array('H', rom).tobytes())
+
+
+Page = Tuple[int, ...]
+
+
+def paginate(ram: Sequence[int], base: Optional['Snapshot'] = None) -> Tuple[Page, ...]:
+    # immutable pages of ram; pages that did not change since base are
+    # base's own, so snapshots taken off a common state share most of it
+    pages = []
+    for start in range(0, RAM_SIZE, PAGE_SIZE):
+        page = tuple(ram[start:start + PAGE_SIZE])
+        if base is not None and base.pages[len(pages)] == page:
+            page = base.pages[len(pages)]
+        pages.append(page)
+    return tuple(pages)
+
+
+class Snapshot:
+    # the full state of a machine; the rom is only identified, and has to
+    # match when the snapshot is restored
+    HEADER = struct.Struct('<4sIIHHQ?')
+    MAGIC = b'HSN1'
+
+    def __init__(
+        self,
+        rom: int,
+        pc: int,
+        a: int,
+        d: int,
+        cycles: int,
+        halted: bool,
+        pages: Tuple[Page, ...]
+    ) -> None:
+        self.rom = rom
+        self.pc = pc
+        self.a = a
+        self.d = d
+        self.cycles = cycles
+        self.halted = halted
+        self.pages = pages
+
+    @property
+    def ram(self) -> List[int]:
+        return list(chain.from_iterable(self.pages))
+
+    def shared(self, other: 'Snapshot') -> int:
+        # pages held in common with another snapshot
+        return sum(1 for mine, theirs in zip(self.pages, other.pages) if mine is theirs)
+
+    def to_bytes(self) -> bytes:
+        header = self.HEADER.pack(
+            self.MAGIC, self.rom, self.pc, self.a, self.d, self.cycles, self.halted
+        )
+        return header + zlib.compress(array('H', self.ram).tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Snapshot':
+        magic, rom, pc, a, d, cycles, halted = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('Not a machine snapshot.')
+        ram = array('H')
+        ram.frombytes(zlib.decompress(data[cls.HEADER.size:]))
+        return cls(rom, pc, a, d, cycles, halted, paginate(ram))
+
+    def write_to(self, path: Path) -> None:
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: Path) -> 'Snapshot':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class Machine:
+    def __init__(self, rom: List[int], decoded: Optional[List[Decoded]] = None) -> None:
+        self.rom = rom
+        self.id = rom_id(rom)
+        if decoded is None:
+            words = decoded_words()
+            decoded = [words[word] for word in rom]
+        self.decoded = decoded
+        self.ram = [0] * RAM_SIZE
+        self.counts = None
+        self.accesses = None
+        # the last snapshot taken or restored, whose pages the next one shares
+        self.base = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.pc = 0
+        self.a = 0
+        self.d = 0
+        self.cycles = 0
+        self.halted = False
+
+    def snapshot(self) -> Snapshot:
+        self.base = Snapshot(
+            self.id, self.pc, self.a, self.d, self.cycles, self.halted,
+            paginate(self.ram, self.base)
+        )
+        return self.base
+
+    def restore(self, snapshot: Snapshot) -> None:
+        if snapshot.rom != self.id:
+            raise ValueError('Snapshot was taken with a different program.')
+        # in place, anything holding on to ram keeps seeing the machine's
+        self.ram[:] = snapshot.ram
+        self.pc, self.a, self.d = snapshot.pc, snapshot.a, snapshot.d
+        self.cycles, self.halted = snapshot.cycles, snapshot.halted
+        self.base = snapshot
+
+    def fork(self, snapshot: Optional[Snapshot] = None) -> 'Machine':
+        # a new machine in this one's state (or snapshot's), sharing the
+        # decoded rom; traps belong to the machine they were set on and are
+        # left out
+        decoded = [
+            decode(self.rom[address]) if instruction.__class__ is Trap else instruction
+            for address, instruction in enumerate(self.decoded)
+        ]
+        machine = Machine(self.rom, decoded)
+        machine.restore(snapshot if snapshot is not None else self.snapshot())
+        return machine
+
+    def digest(self) -> str:
+        # identifies the machine state, to check that runs are reproducible
+        registers = struct.pack('<HHHQ', self.pc, self.a, self.d, self.cycles)
+        return '{:08x}'.format(zlib.crc32(registers + array('H', self.ram).tobytes()))
+
+    def trap(self, address: int, handler: Callable[[List[int]], Optional[int]]) -> None:
+        self.decoded[address] = Trap(handler)
+
+    def enable_counts(self) -> List[int]:
+        # executions per rom address, for profiling
+        if self.counts is None:
+            self.counts = [0] * len(self.rom)
+        return self.counts
+
+    def enable_accesses(self) -> Tuple[List[int], List[int], List[int]]:
+        # reads and writes per ram address, and jumps taken per rom address
+        if self.accesses is None:
+            self.accesses = ([0] * RAM_SIZE, [0] * RAM_SIZE, [0] * len(self.rom))
+        return self.accesses
+
+    def run(self, cycles: int) -> int:
+        decoded = self.decoded
+        size = len(decoded)
+        ram = self.ram
+        counts = self.counts
+        accesses = self.accesses
+        pc, a, d = self.pc, self.a, self.d
+
+        executed = 0
+        while executed < cycles:
+            if pc >= size:
+                self.halted = True
+                break
+            if counts is not None:
+                counts[pc] += 1
+            executed += 1
+
+            instruction = decoded[pc]
+            if instruction.__class__ is int:
+                a = instruction
+                pc += 1
+                continue
+            if instruction.__class__ is Trap:
+                next_pc = instruction.handler(ram)
+                if next_pc is None:
+                    self.halted = True
+                    break
+                pc = next_pc
+                continue
+
+            comp, reads_m, dest, jump = instruction
+            out = comp(d, a, ram[a & ADDRESS_MASK] if reads_m else 0)
+            if accesses is not None:
+                reads, writes, taken = accesses
+                if reads_m:
+                    reads[a & ADDRESS_MASK] += 1
+                if dest & 0b001:
+                    writes[a & ADDRESS_MASK] += 1
+                if jump and jump(out):
+                    taken[pc] += 1
+            if dest & 0b001:
+                ram[a & ADDRESS_MASK] = out
+            if dest & 0b010:
+                d = out
+            if jump and jump(out):
+                # `(END) @END 0;JMP` is the conventional halt
+                if a == pc - 1 and decoded[a] == a:
+                    self.halted = True
+                    pc = a
+                    break
+                pc = a
+            else:
+                pc += 1
+            if dest & 0b100:
+                a = out
+
+        self.pc, self.a, self.d = pc, a, d
+        self.cycles += executed
+        return executed
@@ -0,0 +1,118 @@
+import json
+from pathlib import Path
+
+from emulator.machine import Machine, Snapshot, load_hack
+from emulator.keyboard import KeyScript
+from emulator.profiler import BuildMap, Profiler
+from emulator.stats import Stats, compare
+
+
+def emulate(
+    path: Path,
+    cycles: int,
+    profile: bool = False,
+    dump: str = '',
+    preset: str = '',
+    screen: str = '',
+    frames: str = '',
+    every: int = 100000,
+    keys: str = '',
+    load_state: str = '',
+    save_state: str = '',
+    stats: str = '',
+    baseline: str = ''
+) -> None:
+    machine = Machine(load_hack(path))
+    if load_state:
+        # cycles carry on from the snapshot, so key scripts stay in step
+        machine.restore(Snapshot.load(Path(load_state)))
+    script = KeyScript.load(Path(keys)) if keys else KeyScript([])
+    for assignment in [a for a in preset.split(',') if a]:
+        address, value = assignment.split('=')
+        machine.ram[int(address)] = int(value) & 0xFFFF
+    profiler = None
+    if profile:
+        profiler = Profiler(machine, BuildMap(path.parent / '{}.map'.format(path.name)))
+    collector = Stats(machine) if stats or baseline else None
+
+    if screen or frames:
+        # numpy is only needed for the screen
+        from emulator.framebuffer import Framebuffer
+        framebuffer = Framebuffer(machine.ram)
+        end = machine.cycles + cycles
+        while machine.cycles < end and not machine.halted:
+            script.run(machine, min(every, end - machine.cycles))
+            if frames and framebuffer.update():
+                framebuffer.write_to(Path(frames) / 'frame{:05}.png'.format(framebuffer.frames))
+        if screen:
+            framebuffer.update()
+            framebuffer.write_to(Path(screen))
+    else:
+        script.run(machine, cycles)
+    if save_state:
+        machine.snapshot().write_to(Path(save_state))
+
+    print('{} cycles, {}, state {}'.format(
+        machine.cycles, 'halted' if machine.halted else 'running', machine.digest()
+    ))
+    for address in [int(a) for a in dump.split(',') if a]:
+        print('RAM[{}] = {}'.format(address, machine.ram[address]))
+    if profiler:
+        print(profiler.report())
+    if stats:
+        collector.write_to(Path(stats))
+    if baseline:
+        with open(baseline) as f:
+            print('\n'.join(compare(json.load(f), collector.to_dict())))
+
+
+def batch(path: Path, cycles: int, dump: str = '', preset: str = '') -> None:
+    # every .hack program under path, run side by side in numpy lanes
+    from emulator.lanes import Lanes
+    paths = sorted(path.rglob('*.hack')) if path.is_dir() else [path]
+    lanes = Lanes([load_hack(p) for p in paths])
+    for assignment in [a for a in preset.split(',') if a]:
+        address, value = assignment.split('=')
+        lanes.ram[:, int(address)] = int(value) & 0xFFFF
+    lanes.run(cycles)
+
+    for lane, p in enumerate(paths):
+        print('{}: {} cycles, {}, state {}'.format(
+            p.relative_to(path) if path.is_dir() else p.name, lanes.cycles[lane],
+            'halted' if lanes.halted[lane] else 'running', lanes.digest(lane)
+        ))
+        for address in [int(a) for a in dump.split(',') if a]:
+            print('    RAM[{}] = {}'.format(address, lanes.ram[lane, address]))
+
+
+if __name__ == '__main__':
+    import sys
+    args = sys.argv[2:]
+
+    def option(name: str, default: str) -> str:
+        return args[args.index(name) + 1] if name in args else default
+
+    if '--batch' in args:
+        batch(
+            Path(sys.argv[1]),
+            int(option('--cycles', '1000000')),
+            dump=option('--ram', ''),
+            preset=option('--set', '')
+        )
+        sys.exit()
+
+    emulate(
+        Path(sys.argv[1]),
+        int(option('--cycles', '1000000')),
+        profile='--profile' in args,
+        dump=option('--ram', ''),
+        preset=option('--set', ''),
+        screen=option('--screen', ''),
+        frames=option('--frames', ''),
+        every=int(option('--every', '100000')),
+        keys=option('--keys', ''),
+        load_state=option('--load-state', ''),
+        save_state=option('--save-state', ''),
+        stats=option('--stats', ''),
+        baseline=option('--compare', '')
+    )
@@ -0,0 +1,95 @@
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+from assembler.sourcemap import SourceMap
+from emulator.machine import Machine
+
+
+class BuildMap:
+    # rom address -> vm command and -> jack line, chained from the
+    # <prog>.hack.map the assembler writes next to the program
+    def __init__(self, hack_map: Path) -> None:
+        self.vm = SourceMap.load_chain(hack_map, 2)
+        self.jack = SourceMap.load_chain(hack_map)
+        self.vm_files = {}
+        for source in self.vm.sources:
+            path = hack_map.parent / source
+            if source.endswith('.vm') and path.exists():
+                with open(path) as f:
+                    self.vm_files[source] = f.read().splitlines()
+
+    def command(self, source: str, line: int) -> str:
+        lines = self.vm_files.get(source, [])
+        return lines[line].split('//')[0].strip() if line < len(lines) else ''
+
+
+def ranges(source_map: SourceMap, size: int) -> Iterator[Tuple[int, int, str, int, str]]:
+    entries = list(source_map)
+    for i, (start, source, line, name) in enumerate(entries):
+        end = entries[i + 1][0] if i + 1 < len(entries) else size
+        yield (start, end, source, line, name)
+
+
+class Profiler:
+    def __init__(self, machine: Machine, build_map: BuildMap) -> None:
+        self.machine = machine
+        self.build_map = build_map
+        self.counts = machine.enable_counts()
+
+    def run(self, cycles: int) -> int:
+        return self.machine.run(cycles)
+
+    def flat(self) -> Dict[str, int]:
+        functions = {}
+        for start, end, source, line, name in ranges(self.build_map.jack, len(self.counts)):
+            functions[name] = functions.get(name, 0) + sum(self.counts[start:end])
+        return functions
+
+    def lines(self) -> Dict[Tuple[str, int], int]:
+        lines = {}
+        for start, end, source, line, name in ranges(self.build_map.jack, len(self.counts)):
+            cycles = sum(self.counts[start:end])
+            if source.endswith('.jack') and cycles:
+                lines[(source, line)] = lines.get((source, line), 0) + cycles
+        return lines
+
+    def call_graph(self) -> Dict[Tuple[str, str], int]:
+        # a call's first instruction runs exactly once per call
+        edges = {}
+        for start, end, source, line, name in ranges(self.build_map.vm, len(self.counts)):
+            command = self.build_map.command(source, line)
+            if command.startswith('call ') and start < len(self.counts):
+                calls = self.counts[start]
+                if calls:
+                    edge = (name, command.split()[1])
+                    edges[edge] = edges.get(edge, 0) + calls
+        return edges
+
+    def report(self, top: int = 20) -> str:
+        total = max(sum(self.counts), 1)
+        calls = {}
+        for (caller, callee), count in self.call_graph().items():
+            calls[callee] = calls.get(callee, 0) + count
+
+        lines = ['{:>12} {:>7} {:>9}  {}'.format('cycles', '%', 'calls', 'function')]
+        ranked = sorted(self.flat().items(), key=lambda item: -item[1])
+        for function, cycles in ranked[:top]:
+            lines.append('{:>12} {:>6.2f}% {:>9}  {}'.format(
+                cycles, 100 * cycles / total, calls.get(function, ''), function
+            ))
+
+        lines.append('')
+        lines.append('{:>12} {:>7}  {}'.format('cycles', '%', 'line'))
+        ranked = sorted(self.lines().items(), key=lambda item: -item[1])
+        for (source, line), cycles in ranked[:top]:
+            lines.append('{:>12} {:>6.2f}%  {}:{}'.format(
+                cycles, 100 * cycles / total, source, line
+            ))
+
+        lines.append('')
+        lines.append('{:>9}  {}'.format('calls', 'caller -> callee'))
+        ranked = sorted(self.call_graph().items(), key=lambda item: -item[1])
+        for (caller, callee), count in ranked[:top]:
+            lines.append('{:>9}  {} -> {}'.format(count, caller, callee))
+
+        return '\n'.join(lines)
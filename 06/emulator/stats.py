@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from emulator.decode import COMP_NAMES, DEST_NAMES, JUMP_NAMES, decode_table
+from emulator.machine import Machine
+
+# the standard memory map; the segments themselves are only addressed
+# through their pointers, so local, argument, this and that accesses land
+# in the stack and the heap
+REGIONS = [
+    ('SP', 0, 1),
+    ('LCL', 1, 2),
+    ('ARG', 2, 3),
+    ('THIS', 3, 4),
+    ('THAT', 4, 5),
+    ('temp', 5, 13),
+    ('R13-R15', 13, 16),
+    ('static', 16, 256),
+    ('stack', 256, 2048),
+    ('heap', 2048, 16384),
+    ('screen', 16384, 24576),
+    ('keyboard', 24576, 24577),
+]
+
+
+class Stats:
+    # what a run executed: instructions by class, comp, dest and jump (taken
+    # or not), and ram traffic by region, as json for comparing builds
+    def __init__(self, machine: Machine) -> None:
+        self.machine = machine
+        self.counts = machine.enable_counts()
+        self.reads, self.writes, self.taken = machine.enable_accesses()
+
+    def instructions(self) -> Dict[str, Dict[str, int]]:
+        classes = {'A': 0, 'C': 0}
+        comps = {}
+        dests = {}
+        jumps = {}
+        table = decode_table()
+        for address, count in enumerate(self.counts):
+            if not count:
+                continue
+            word = self.machine.rom[address]
+            if not table.kind[word]:
+                classes['A'] += count
+                continue
+            classes['C'] += count
+            comp_name = COMP_NAMES[table.comp[word]]
+            comps[comp_name] = comps.get(comp_name, 0) + count
+            dest_name = DEST_NAMES[table.dest[word]] or 'none'
+            dests[dest_name] = dests.get(dest_name, 0) + count
+            jump = table.jump[word]
+            if jump:
+                entry = jumps.setdefault(JUMP_NAMES[jump], {'executed': 0, 'taken': 0})
+                entry['executed'] += count
+                entry['taken'] += self.taken[address]
+        return {'classes': classes, 'comp': comps, 'dest': dests, 'jump': jumps}
+
+    def memory(self) -> Dict[str, Dict[str, int]]:
+        regions = {}
+        for name, start, end in REGIONS:
+            regions[name] = {
+                'reads': sum(self.reads[start:end]),
+                'writes': sum(self.writes[start:end])
+            }
+        return regions
+
+    def heatmap(self, size: int = 256) -> Dict[str, object]:
+        # accesses per block of size words, over the whole ram
+        return {
+            'block': size,
+            'reads': [sum(self.reads[i:i + size]) for i in range(0, len(self.reads), size)],
+            'writes': [sum(self.writes[i:i + size]) for i in range(0, len(self.writes), size)]
+        }
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'cycles': self.machine.cycles,
+            'instructions': self.instructions(),
+            'memory': self.memory(),
+            'heatmap': self.heatmap()
+        }
+
+    def write_to(self, path: Path) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+
+def flatten(stats: Dict[str, object], prefix: str = '') -> Dict[str, int]:
+    values = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, '{}{}.'.format(prefix, key)))
+        elif isinstance(value, int):
+            values['{}{}'.format(prefix, key)] = value
+    return values
+
+
+def compare(old: Dict[str, object], new: Dict[str, object]) -> List[str]:
+    # the counters that changed between two runs, largest change first
+    before, after = flatten(old), flatten(new)
+    changes = []
+    for key in sorted(set(before) | set(after)):
+        a, b = before.get(key, 0), after.get(key, 0)
+        if a != b:
+            changes.append((abs(b - a), key, a, b))
+    changes.sort(key=lambda change: (-change[0], change[1]))
+    return [
+        '{:<32} {:>12} {:>12} {:>+9.1%}'.format(key, a, b, (b - a) / a if a else 1.0)
+        for _, key, a, b in changes
+    ]
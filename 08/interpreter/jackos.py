@@ -0,0 +1,435 @@
+from math import isqrt
+from typing import Callable, Collection, Dict, List
+
+from interpreter.font import FONT
+
+
+HEAP_BASE = 2048
+HEAP_END = 16384
+SCREEN = 16384
+KBD = 24576
+
+ROWS = 23
+COLUMNS = 64
+
+NEW_LINE = 128
+BACKSPACE = 129
+
+
+# natives that use the string layout or the heap of another class
+# directly, so they can't run natively while that class is compiled
+SHARED = {
+    'String': ['Output.printString', 'Keyboard.readLine', 'Keyboard.readInt'],
+    'Memory': [
+        'Array.new', 'Array.dispose', 'String.new', 'String.dispose', 'Keyboard.readLine'
+    ],
+}
+
+
+def signed(value: int) -> int:
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def conflicts(compiled: Collection[str], native: Collection[str]) -> List[str]:
+    # the functions in native that can't run natively next to the compiled
+    # classes, e.g. 'Output.printString needs the native String'
+    return [
+        '{} needs the native {}'.format(name, shared)
+        for shared, names in SHARED.items() if shared in compiled
+        for name in names if name in native
+    ]
+
+
+class JackOS:
+    # the jack os classes in python, working on the machine's ram directly
+    # so compiled code sees the same heap, strings and screen it would with
+    # the jack versions. each call takes and returns 16 bit words, and the
+    # same instance can serve the vm interpreter or the hack emulator.
+    def __init__(self, ram: List[int]) -> None:
+        self.ram = ram
+        self.input = ''
+        self.reset()
+
+    def reset(self) -> None:
+        # free heap blocks as [address, size], sorted by address
+        self.free = [[HEAP_BASE, HEAP_END - HEAP_BASE]]
+        self.color = True
+        self.row = 0
+        self.column = 0
+        self.output = []
+        self.halted = False
+        self.exit_code = 0
+
+    def natives(self) -> Dict[str, Callable[..., int]]:
+        return {
+            'Math.init': self.noop,
+            'Math.abs': self.abs,
+            'Math.multiply': self.multiply,
+            'Math.divide': self.divide,
+            'Math.min': self.min,
+            'Math.max': self.max,
+            'Math.sqrt': self.sqrt,
+            'Memory.init': self.memory_init,
+            'Memory.peek': self.peek,
+            'Memory.poke': self.poke,
+            'Memory.alloc': self.alloc,
+            'Memory.deAlloc': self.de_alloc,
+            'Array.new': self.array_new,
+            'Array.dispose': self.dispose,
+            'String.new': self.string_new,
+            'String.dispose': self.string_dispose,
+            'String.length': self.length,
+            'String.charAt': self.char_at,
+            'String.setCharAt': self.set_char_at,
+            'String.appendChar': self.append_char,
+            'String.eraseLastChar': self.erase_last_char,
+            'String.intValue': self.int_value,
+            'String.setInt': self.set_int,
+            'String.newLine': self.new_line,
+            'String.backSpace': self.backspace,
+            'String.doubleQuote': self.double_quote,
+            'Output.init': self.noop,
+            'Output.moveCursor': self.move_cursor,
+            'Output.printChar': self.print_char,
+            'Output.printString': self.print_string,
+            'Output.printInt': self.print_int,
+            'Output.println': self.println,
+            'Output.backSpace': self.output_backspace,
+            'Screen.init': self.noop,
+            'Screen.clearScreen': self.clear_screen,
+            'Screen.setColor': self.set_color,
+            'Screen.drawPixel': self.draw_pixel,
+            'Screen.drawLine': self.draw_line,
+            'Screen.drawRectangle': self.draw_rectangle,
+            'Screen.drawCircle': self.draw_circle,
+            'Keyboard.init': self.noop,
+            'Keyboard.keyPressed': self.key_pressed,
+            'Keyboard.readChar': self.read_char,
+            'Keyboard.readLine': self.read_line,
+            'Keyboard.readInt': self.read_int,
+            'Sys.halt': self.halt,
+            'Sys.error': self.error,
+            'Sys.wait': self.noop,
+        }
+
+    def noop(self, *args: int) -> int:
+        return 0
+
+    # Math
+
+    def abs(self, x: int) -> int:
+        return abs(signed(x)) & 0xFFFF
+
+    def multiply(self, x: int, y: int) -> int:
+        return (x * y) & 0xFFFF
+
+    def divide(self, x: int, y: int) -> int:
+        if y == 0:
+            return self.error(3)
+        x, y = signed(x), signed(y)
+        quotient = abs(x) // abs(y)
+        return (quotient if (x < 0) == (y < 0) else -quotient) & 0xFFFF
+
+    def min(self, x: int, y: int) -> int:
+        return x if signed(x) < signed(y) else y
+
+    def max(self, x: int, y: int) -> int:
+        return x if signed(x) > signed(y) else y
+
+    def sqrt(self, x: int) -> int:
+        if signed(x) < 0:
+            return self.error(4)
+        return isqrt(x)
+
+    # Memory
+
+    def memory_init(self) -> int:
+        self.free = [[HEAP_BASE, HEAP_END - HEAP_BASE]]
+        return 0
+
+    def peek(self, address: int) -> int:
+        return self.ram[address & 0x7FFF]
+
+    def poke(self, address: int, value: int) -> int:
+        self.ram[address & 0x7FFF] = value
+        return 0
+
+    def alloc(self, size: int) -> int:
+        # blocks keep their size in the word before them for deAlloc
+        size = signed(size)
+        if size <= 0:
+            return self.error(5)
+        for block in self.free:
+            if block[1] > size:
+                address = block[0] + 1
+                block[0] += size + 1
+                block[1] -= size + 1
+                if not block[1]:
+                    self.free.remove(block)
+                self.ram[address - 1] = size
+                return address
+        return self.error(6)
+
+    def de_alloc(self, address: int) -> int:
+        start, size = address - 1, self.ram[address - 1] + 1
+        i = 0
+        while i < len(self.free) and self.free[i][0] < start:
+            i += 1
+        self.free.insert(i, [start, size])
+        # merge with the following, then the preceding free block
+        if i + 1 < len(self.free) and start + size == self.free[i + 1][0]:
+            self.free[i][1] += self.free.pop(i + 1)[1]
+        if i > 0 and self.free[i - 1][0] + self.free[i - 1][1] == start:
+            self.free[i - 1][1] += self.free.pop(i)[1]
+        return 0
+
+    def array_new(self, size: int) -> int:
+        if signed(size) <= 0:
+            return self.error(2)
+        return self.alloc(size)
+
+    def dispose(self, address: int) -> int:
+        return self.de_alloc(address)
+
+    # String: [characters, length, max length]
+
+    def string_new(self, max_length: int) -> int:
+        if signed(max_length) < 0:
+            return self.error(14)
+        string = self.alloc(3)
+        # the empty string has no characters to allocate
+        self.ram[string] = self.alloc(max_length) if max_length else 0
+        self.ram[string + 1] = 0
+        self.ram[string + 2] = max_length
+        return string
+
+    def string_dispose(self, string: int) -> int:
+        if self.ram[string + 2]:
+            self.de_alloc(self.ram[string])
+        return self.de_alloc(string)
+
+    def chars(self, string: int) -> List[int]:
+        start = self.ram[string]
+        return self.ram[start:start + self.ram[string + 1]]
+
+    def text(self, string: int) -> str:
+        return ''.join(chr(c) for c in self.chars(string))
+
+    def length(self, string: int) -> int:
+        return self.ram[string + 1]
+
+    def char_at(self, string: int, index: int) -> int:
+        return self.ram[self.ram[string] + index]
+
+    def set_char_at(self, string: int, index: int, char: int) -> int:
+        self.ram[self.ram[string] + index] = char
+        return 0
+
+    def append_char(self, string: int, char: int) -> int:
+        length = self.ram[string + 1]
+        if length >= self.ram[string + 2]:
+            return self.error(17)
+        self.ram[self.ram[string] + length] = char
+        self.ram[string + 1] = length + 1
+        return string
+
+    def erase_last_char(self, string: int) -> int:
+        if self.ram[string + 1]:
+            self.ram[string + 1] -= 1
+        return 0
+
+    def int_value(self, string: int) -> int:
+        chars = self.chars(string)
+        negative = bool(chars) and chars[0] == ord('-')
+        value = 0
+        for char in chars[1 if negative else 0:]:
+            if not ord('0') <= char <= ord('9'):
+                break
+            value = value * 10 + char - ord('0')
+        return (-value if negative else value) & 0xFFFF
+
+    def set_int(self, string: int, value: int) -> int:
+        digits = str(signed(value))
+        if len(digits) > self.ram[string + 2]:
+            return self.error(19)
+        start = self.ram[string]
+        self.ram[start:start + len(digits)] = [ord(c) for c in digits]
+        self.ram[string + 1] = len(digits)
+        return 0
+
+    def new_line(self) -> int:
+        return NEW_LINE
+
+    def backspace(self) -> int:
+        return BACKSPACE
+
+    def double_quote(self) -> int:
+        return ord('"')
+
+    # Output, drawn in the os font and also kept as text
+
+    def draw_char(self, char: int) -> None:
+        glyph = FONT.get(char, FONT[0])
+        address = SCREEN + self.row * 11 * 32 + self.column // 2
+        shift = 8 if self.column & 1 else 0
+        keep = ~(0xFF << shift) & 0xFFFF
+        for i, bits in enumerate(glyph):
+            self.ram[address + i * 32] = self.ram[address + i * 32] & keep | bits << shift
+
+    def move_cursor(self, row: int, column: int) -> int:
+        if not (0 <= row < ROWS and 0 <= column < COLUMNS):
+            return self.error(20)
+        self.row, self.column = row, column
+        self.draw_char(ord(' '))
+        return 0
+
+    def print_char(self, char: int) -> int:
+        if char == NEW_LINE:
+            return self.println()
+        elif char == BACKSPACE:
+            return self.output_backspace()
+        self.draw_char(char)
+        self.output.append(chr(char))
+        self.column += 1
+        if self.column == COLUMNS:
+            self.row, self.column = (self.row + 1) % ROWS, 0
+        return 0
+
+    def print_string(self, string: int) -> int:
+        for char in self.chars(string):
+            self.print_char(char)
+        return 0
+
+    def print_int(self, value: int) -> int:
+        for char in str(signed(value)):
+            self.print_char(ord(char))
+        return 0
+
+    def println(self) -> int:
+        self.output.append('\n')
+        self.row, self.column = (self.row + 1) % ROWS, 0
+        return 0
+
+    def output_backspace(self) -> int:
+        if self.column:
+            self.column -= 1
+        elif self.row:
+            self.row, self.column = self.row - 1, COLUMNS - 1
+        self.draw_char(ord(' '))
+        if self.output:
+            self.output[-1] = self.output[-1][:-1]
+        return 0
+
+    # Screen
+
+    def clear_screen(self) -> int:
+        self.ram[SCREEN:KBD] = [0] * (KBD - SCREEN)
+        return 0
+
+    def set_color(self, color: int) -> int:
+        self.color = bool(color)
+        return 0
+
+    def fill_row(self, y: int, x1: int, x2: int) -> None:
+        # pixels x1..x2 of row y, a word at a time
+        row = SCREEN + y * 32
+        for word in range(x1 // 16, x2 // 16 + 1):
+            low = max(x1 - word * 16, 0)
+            high = min(x2 - word * 16, 15)
+            mask = ((1 << (high + 1)) - 1) ^ ((1 << low) - 1)
+            if self.color:
+                self.ram[row + word] |= mask
+            else:
+                self.ram[row + word] &= ~mask & 0xFFFF
+
+    def draw_pixel(self, x: int, y: int) -> int:
+        if not (0 <= x < 512 and 0 <= y < 256):
+            return self.error(7)
+        self.fill_row(y, x, x)
+        return 0
+
+    def draw_line(self, x1: int, y1: int, x2: int, y2: int) -> int:
+        if not (x1 < 512 and x2 < 512 and y1 < 256 and y2 < 256):
+            return self.error(8)
+        if y1 == y2:
+            self.fill_row(y1, min(x1, x2), max(x1, x2))
+            return 0
+        dx, dy = abs(x2 - x1), -abs(y2 - y1)
+        sx, sy = (1 if x1 < x2 else -1), (1 if y1 < y2 else -1)
+        diff = dx + dy
+        while True:
+            self.fill_row(y1, x1, x1)
+            if x1 == x2 and y1 == y2:
+                return 0
+            e2 = 2 * diff
+            if e2 >= dy:
+                diff += dy
+                x1 += sx
+            if e2 <= dx:
+                diff += dx
+                y1 += sy
+
+    def draw_rectangle(self, x1: int, y1: int, x2: int, y2: int) -> int:
+        if not (x1 <= x2 < 512 and y1 <= y2 < 256):
+            return self.error(9)
+        for y in range(y1, y2 + 1):
+            self.fill_row(y, x1, x2)
+        return 0
+
+    def draw_circle(self, x: int, y: int, r: int) -> int:
+        x, y, r = signed(x), signed(y), signed(r)
+        if not (0 <= x < 512 and 0 <= y < 256):
+            return self.error(12)
+        if x - r < 0 or x + r > 511 or y - r < 0 or y + r > 255:
+            return self.error(13)
+        for dy in range(-r, r + 1):
+            dx = isqrt(r * r - dy * dy)
+            self.fill_row(y + dy, x - dx, x + dx)
+        return 0
+
+    # Keyboard, fed from self.input
+
+    def key_pressed(self) -> int:
+        return self.ram[KBD]
+
+    def read_char(self) -> int:
+        if not self.input:
+            # nothing left to type: the program would wait forever
+            return self.halt()
+        char, self.input = self.input[0], self.input[1:]
+        code = NEW_LINE if char == '\n' else ord(char)
+        self.print_char(code)
+        return code
+
+    def read_text(self, message: int) -> str:
+        self.print_string(message)
+        line, _, self.input = self.input.partition('\n')
+        for char in line:
+            self.print_char(ord(char))
+        self.println()
+        return line
+
+    def read_line(self, message: int) -> int:
+        line = self.read_text(message)
+        string = self.string_new(max(len(line), 1))
+        for char in line:
+            self.append_char(string, ord(char))
+        return string
+
+    def read_int(self, message: int) -> int:
+        line = self.read_text(message).strip()
+        digits = line[1:] if line.startswith('-') else line
+        value = int(digits) if digits.isdigit() else 0
+        return (-value if line.startswith('-') else value) & 0xFFFF
+
+    # Sys
+
+    def halt(self) -> int:
+        self.halted = True
+        return 0
+
+    def error(self, code: int) -> int:
+        for char in 'ERR{}'.format(code):
+            self.print_char(ord(char))
+        self.exit_code = code
+        return self.halt()
@@ -0,0 +1,273 @@
+from typing import Callable, Collection, Dict, Optional
+
+from translator.parser import Parser
+from interpreter.jackos import JackOS, conflicts
+
+
+RAM_SIZE = 32768
+SP, LCL, ARG, THIS, THAT = 0, 1, 2, 3, 4
+
+# opcodes, roughly by how often compiled code runs them
+PUSH_CONSTANT = 0
+PUSH_SEGMENT = 1
+PUSH_FIXED = 2
+POP_SEGMENT = 3
+POP_FIXED = 4
+ADD = 5
+SUB = 6
+IF_GOTO = 7
+GOTO = 8
+EQ = 9
+GT = 10
+LT = 11
+AND = 12
+OR = 13
+NOT = 14
+NEG = 15
+CALL = 16
+CALL_NATIVE = 17
+FUNCTION = 18
+RETURN = 19
+
+ARITHMETIC = {
+    'add': ADD, 'sub': SUB, 'neg': NEG, 'eq': EQ, 'gt': GT, 'lt': LT,
+    'and': AND, 'or': OR, 'not': NOT, 'return': RETURN
+}
+SEGMENTS = {'local': LCL, 'argument': ARG, 'this': THIS, 'that': THAT}
+
+
+class VMError(Exception):
+    pass
+
+
+class Program:
+    # vm commands decoded into (opcode, a, b) tuples, with labels, calls
+    # and statics resolved to code indices and ram addresses up front.
+    # os calls go to the natives unless their class is listed in compiled
+    # and the program defines the function ('all' keeps every class). a
+    # compiled String or Memory can't be mixed with natives that use its
+    # objects directly.
+    def __init__(
+        self,
+        parser: Parser,
+        natives: Dict[str, Callable[..., int]],
+        compiled: Collection[str] = ()
+    ) -> None:
+        self.code = []
+        self.functions = {}
+        self.statics = {}
+        labels = {}
+        jumps = []
+        calls = []
+
+        function = ''
+        for file, command in parser:
+            parts = command.command.split(' ')
+            op = parts[0]
+            if op == 'push' or op == 'pop':
+                self.code.append(self.memory(op, parts[1], int(parts[2]), file))
+            elif op in ARITHMETIC:
+                self.code.append((ARITHMETIC[op], 0, 0))
+            elif op == 'label':
+                labels[(function, parts[1])] = len(self.code)
+            elif op == 'goto' or op == 'if-goto':
+                jumps.append((len(self.code), (function, parts[1])))
+                self.code.append((GOTO if op == 'goto' else IF_GOTO, 0, 0))
+            elif op == 'function':
+                function = parts[1]
+                self.functions[function] = len(self.code)
+                self.code.append((FUNCTION, int(parts[2]), 0))
+            elif op == 'call':
+                calls.append((len(self.code), parts[1], int(parts[2])))
+                self.code.append(None)
+
+        for index, label in jumps:
+            if label not in labels:
+                raise VMError('Unknown label {} in {}.'.format(label[1], label[0]))
+            self.code[index] = (self.code[index][0], labels[label], 0)
+        native = set()
+        for index, name, args in calls:
+            keep = 'all' in compiled or name.split('.')[0] in compiled
+            if name in natives and not (keep and name in self.functions):
+                self.code[index] = (CALL_NATIVE, natives[name], args)
+                native.add(name)
+            elif name in self.functions:
+                self.code[index] = (CALL, self.functions[name], args)
+            else:
+                self.code[index] = (CALL_NATIVE, self.unknown(name), args)
+
+        kept = set(
+            name.split('.')[0] for name in self.functions
+            if name in natives and ('all' in compiled or name.split('.')[0] in compiled)
+        )
+        clashes = conflicts(kept, native)
+        if clashes:
+            raise VMError(
+                'Cannot mix compiled and native os: {}; list their classes in --jack too.'
+                .format(', '.join(clashes))
+            )
+
+    def unknown(self, name: str) -> Callable[..., int]:
+        # only an error if the call actually runs
+        def call(*args: int) -> int:
+            raise VMError('Unknown function {}.'.format(name))
+        return call
+
+    def memory(self, op: str, segment: str, index: int, file: str) -> tuple:
+        if segment == 'constant':
+            if op == 'pop':
+                raise VMError('Cannot pop to constant.')
+            return (PUSH_CONSTANT, index, 0)
+        if segment in SEGMENTS:
+            return (PUSH_SEGMENT if op == 'push' else POP_SEGMENT, SEGMENTS[segment], index)
+        if segment == 'pointer':
+            address = 3 + index
+        elif segment == 'temp':
+            address = 5 + index
+        elif segment == 'static':
+            # numbered from 16 in order of first use, as the assembler does
+            key = '{}.{}'.format(file, index)
+            address = self.statics.setdefault(key, 16 + len(self.statics))
+        else:
+            raise VMError('Unknown segment {}.'.format(segment))
+        return (PUSH_FIXED if op == 'push' else POP_FIXED, address, 0)
+
+
+class VM:
+    def __init__(
+        self,
+        parser: Parser,
+        os: Optional[JackOS] = None,
+        compiled: Collection[str] = ()
+    ) -> None:
+        self.ram = [0] * RAM_SIZE
+        self.os = os if os else JackOS(self.ram)
+        self.program = Program(parser, self.os.natives(), compiled)
+        self.reset()
+
+    def reset(self) -> None:
+        self.ram[:] = [0] * RAM_SIZE
+        self.os.reset()
+        self.cycles = 0
+        self.halted = False
+        code = self.program.code
+        functions = self.program.functions
+
+        # same bootstrap as the translator: Sys.init gets a call frame, and
+        # returning from it, or from Main.main without a Sys.init, halts
+        if 'Sys.init' in functions or 'Main.main' in functions:
+            self.ram[SP] = 261
+            self.ram[LCL] = 261
+            self.ram[ARG] = 256
+            self.ram[256] = len(code)
+            self.pc = functions['Sys.init'] if 'Sys.init' in functions else functions['Main.main']
+        else:
+            self.ram[SP] = 256
+            self.pc = 0
+
+    def run(self, steps: int) -> int:
+        code = self.program.code
+        size = len(code)
+        ram = self.ram
+        os = self.os
+        pc = self.pc
+        sp = ram[SP]
+
+        executed = 0
+        while executed < steps:
+            if pc >= size:
+                self.halted = True
+                break
+            op, a, b = code[pc]
+            pc += 1
+            executed += 1
+
+            if op == PUSH_CONSTANT:
+                ram[sp] = a
+                sp += 1
+            elif op == PUSH_SEGMENT:
+                ram[sp] = ram[(ram[a] + b) & 0x7FFF]
+                sp += 1
+            elif op == PUSH_FIXED:
+                ram[sp] = ram[a]
+                sp += 1
+            elif op == POP_SEGMENT:
+                sp -= 1
+                ram[(ram[a] + b) & 0x7FFF] = ram[sp]
+            elif op == POP_FIXED:
+                sp -= 1
+                ram[a] = ram[sp]
+            elif op == ADD:
+                sp -= 1
+                ram[sp - 1] = (ram[sp - 1] + ram[sp]) & 0xFFFF
+            elif op == SUB:
+                sp -= 1
+                ram[sp - 1] = (ram[sp - 1] - ram[sp]) & 0xFFFF
+            elif op == IF_GOTO:
+                sp -= 1
+                if ram[sp]:
+                    pc = a
+            elif op == GOTO:
+                pc = a
+            elif op <= LT:
+                # comparisons are signed, and on the raw difference like the
+                # translated code
+                sp -= 1
+                diff = (ram[sp - 1] - ram[sp]) & 0xFFFF
+                if op == EQ:
+                    result = diff == 0
+                elif op == GT:
+                    result = 0 < diff < 0x8000
+                else:
+                    result = diff >= 0x8000
+                ram[sp - 1] = 0xFFFF if result else 0
+            elif op == AND:
+                sp -= 1
+                ram[sp - 1] &= ram[sp]
+            elif op == OR:
+                sp -= 1
+                ram[sp - 1] |= ram[sp]
+            elif op == NOT:
+                ram[sp - 1] ^= 0xFFFF
+            elif op == NEG:
+                ram[sp - 1] = -ram[sp - 1] & 0xFFFF
+            elif op == CALL:
+                ram[sp] = pc
+                ram[sp + 1] = ram[LCL]
+                ram[sp + 2] = ram[ARG]
+                ram[sp + 3] = ram[THIS]
+                ram[sp + 4] = ram[THAT]
+                ram[ARG] = sp - b
+                sp += 5
+                ram[LCL] = sp
+                pc = a
+            elif op == CALL_NATIVE:
+                sp -= b
+                ram[SP] = sp
+                ram[sp] = a(*ram[sp:sp + b]) & 0xFFFF
+                sp += 1
+                if os.halted:
+                    self.halted = True
+                    break
+            elif op == FUNCTION:
+                for i in range(a):
+                    ram[sp + i] = 0
+                sp += a
+            else:
+                frame = ram[LCL]
+                pc = ram[frame - 5]
+                arg = ram[ARG]
+                ram[arg] = ram[sp - 1]
+                sp = arg + 1
+                ram[THAT] = ram[frame - 1]
+                ram[THIS] = ram[frame - 2]
+                ram[ARG] = ram[frame - 3]
+                ram[LCL] = ram[frame - 4]
+
+        ram[SP] = sp
+        self.pc = pc
+        self.cycles += executed
+        return executed
+
+    def output(self) -> str:
+        return ''.join(self.os.output)
@@ -0,0 +1,44 @@
+import time
+from pathlib import Path
+
+from translator.parser import load
+from interpreter.machine import VM
+
+
+def interpret(
+    path: Path,
+    steps: int,
+    dump: str = '',
+    keys: str = '',
+    compiled: str = ''
+) -> None:
+    vm = VM(load(path), compiled=[c for c in compiled.split(',') if c])
+    vm.os.input = keys
+
+    start = time.perf_counter()
+    vm.run(steps)
+    elapsed = time.perf_counter() - start
+
+    print('{} steps in {:.1f} ms, {}'.format(
+        vm.cycles, elapsed * 1000, 'halted' if vm.halted else 'running'
+    ))
+    if vm.output():
+        print(vm.output())
+    for address in [int(a) for a in dump.split(',') if a]:
+        print('RAM[{}] = {}'.format(address, vm.ram[address]))
+
+
+if __name__ == '__main__':
+    import sys
+    args = sys.argv[2:]
+
+    def option(name: str, default: str) -> str:
+        return args[args.index(name) + 1] if name in args else default
+
+    interpret(
+        Path(sys.argv[1]),
+        int(option('--steps', '10000000')),
+        dump=option('--ram', ''),
+        keys=option('--input', '').replace('\\n', '\n'),
+        compiled=option('--jack', '')
+    )
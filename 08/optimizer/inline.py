@@ -0,0 +1,197 @@
+from typing import List, Optional, Set
+
+from translator.commands import Command, Function as FunctionCommand, parse_command
+from optimizer.program import Program, Function, asm_cost
+
+
+class InlineSite:
+    def __init__(self, caller: str, callee: str, saved: int) -> None:
+        self.caller = caller
+        self.callee = callee
+        # estimated hack instructions saved each time the site executes
+        self.saved = saved
+
+
+def live_temps(commands: List[Command]) -> List[Set[int]]:
+    # the temp slots each command leaves live, i.e. read again before they
+    # are next written, found by iterating backwards to a fixed point
+    parts = [command.command.split(' ') for command in commands]
+    labels = {}
+    current = None
+    for i, p in enumerate(parts):
+        if p[0] == 'function':
+            current = p[1]
+        elif p[0] == 'label':
+            labels[(current, p[1])] = i
+
+    successors = []
+    current = None
+    for i, p in enumerate(parts):
+        if p[0] == 'function':
+            current = p[1]
+        following = [i + 1] if i + 1 < len(parts) and parts[i + 1][0] != 'function' else []
+        if p[0] == 'return':
+            successors.append([])
+        elif p[0] in {'goto', 'if-goto'}:
+            target = labels.get((current, p[1]))
+            jumps = [] if target is None else [target]
+            successors.append(jumps if p[0] == 'goto' else following + jumps)
+        else:
+            successors.append(following)
+
+    live_in = [set() for _ in parts]
+    live_out = [set() for _ in parts]
+    changed = True
+    while changed:
+        changed = False
+        for i in reversed(range(len(parts))):
+            out = set().union(*(live_in[j] for j in successors[i]))
+            p = parts[i]
+            live = set(out)
+            if len(p) == 3 and p[1] == 'temp':
+                if p[0] == 'pop':
+                    live.discard(int(p[2]))
+                else:
+                    live.add(int(p[2]))
+            live_out[i] = out
+            if live != live_in[i]:
+                live_in[i] = live
+                changed = True
+    return live_out
+
+
+class Inliner:
+    # inlined arguments and locals live in the temp segment. compiled jack
+    # keeps no temps live across a call, but hand-written vm may, so sites
+    # where the caller still needs a slot the expansion writes are skipped
+    TEMP_SLOTS = 8
+
+    def __init__(self, program: Program, threshold: int = 8) -> None:
+        self.program = program
+        self.threshold = threshold
+        self.site_count = 0
+
+    def inlinable(self, function: Function) -> bool:
+        if len(function.body) > self.threshold or not function.body:
+            return False
+        if function.body[-1].command != 'return':
+            return False
+        for parts in function.parts():
+            if parts[0] in {'call', 'function'}:
+                return False
+        return True
+
+    def uses(self, function: Function, segment: str) -> bool:
+        return any(len(p) == 3 and p[1] == segment for p in function.parts())
+
+    def writes_pointer(self, function: Function, index: int) -> bool:
+        return any(p == ['pop', 'pointer', str(index)] for p in function.parts())
+
+    def run(self) -> List[InlineSite]:
+        functions = self.program.functions()
+        candidates = dict(
+            (name, function) for name, function in functions.items()
+            if self.inlinable(function)
+        )
+
+        sites = []
+        for file, commands in self.program.files.items():
+            out = []
+            current = None
+            live = live_temps(commands)
+            for command, live_after in zip(commands, live):
+                parts = command.command.split(' ')
+                if isinstance(command, FunctionCommand):
+                    current = parts[1]
+                expanded = None
+                if parts[0] == 'call' and parts[1] in candidates:
+                    callee = candidates[parts[1]]
+                    # statics are scoped to their file
+                    if callee.file == file or not self.uses(callee, 'static'):
+                        expanded = self.expand(callee, int(parts[2]), live_after)
+                if expanded is None:
+                    out.append(command)
+                    continue
+                original = asm_cost([command, FunctionCommand(
+                    'function {} {}'.format(callee.name, callee.n_locals)
+                )] + callee.body, callee.file, callee.name)
+                saved = original - asm_cost(expanded, file, current)
+                if saved <= 0:
+                    out.append(command)
+                    continue
+                out.extend(expanded)
+                sites.append(InlineSite(current, callee.name, saved))
+            self.program.files[file] = out
+        return sites
+
+    def expand(
+        self,
+        callee: Function,
+        n_args: int,
+        live: Set[int]
+    ) -> Optional[List[Command]]:
+        temps = [int(p[2]) for p in callee.parts() if len(p) == 3 and p[1] == 'temp']
+        arg_base = max(temps) + 1 if temps else 0
+        local_base = arg_base + n_args
+        slot = local_base + callee.n_locals
+        saved_pointers = {}
+        for index in (0, 1):
+            if self.writes_pointer(callee, index):
+                saved_pointers[index] = slot
+                slot += 1
+        if slot > self.TEMP_SLOTS:
+            return None
+        written = set(range(arg_base, slot))
+        written.update(int(p[2]) for p in callee.parts() if p[:2] == ['pop', 'temp'])
+        if written & live:
+            return None
+
+        self.site_count += 1
+        prefix = 'INLINE_{}_'.format(self.site_count)
+        lines = []
+        for i in reversed(range(n_args)):
+            lines.append('pop temp {}'.format(arg_base + i))
+        for i in range(callee.n_locals):
+            lines.append('push constant 0')
+            lines.append('pop temp {}'.format(local_base + i))
+        for index, temp in saved_pointers.items():
+            lines.append('push pointer {}'.format(index))
+            lines.append('pop temp {}'.format(temp))
+
+        early_return = False
+        for i, parts in enumerate(callee.parts()):
+            if parts[0] in {'push', 'pop'} and parts[1] == 'argument':
+                lines.append('{} temp {}'.format(parts[0], arg_base + int(parts[2])))
+            elif parts[0] in {'push', 'pop'} and parts[1] == 'local':
+                lines.append('{} temp {}'.format(parts[0], local_base + int(parts[2])))
+            elif parts[0] in {'label', 'goto', 'if-goto'}:
+                lines.append('{} {}{}'.format(parts[0], prefix, parts[1]))
+            elif parts[0] == 'return':
+                if i < len(callee.body) - 1:
+                    lines.append('goto {}END'.format(prefix))
+                    early_return = True
+            else:
+                lines.append(' '.join(parts))
+
+        if early_return:
+            lines.append('label {}END'.format(prefix))
+        for index, temp in saved_pointers.items():
+            lines.append('push temp {}'.format(temp))
+            lines.append('pop pointer {}'.format(index))
+
+        return [parse_command(line) for line in lines]
+
+
+def report(sites: List[InlineSite]) -> str:
+    by_callee = {}
+    for site in sites:
+        by_callee.setdefault(site.callee, []).append(site)
+    lines = ['{:<40} {:>6} {:>14}'.format('function', 'sites', 'saved/call')]
+    for callee, callee_sites in sorted(by_callee.items()):
+        lines.append('{:<40} {:>6} {:>14}'.format(
+            callee, len(callee_sites), callee_sites[0].saved
+        ))
+    lines.append('{} call sites inlined, {} instructions saved if each runs once'.format(
+        len(sites), sum(site.saved for site in sites)
+    ))
+    return '\n'.join(lines)
@@ -0,0 +1,28 @@
+from pathlib import Path
+
+from optimizer.program import Program
+from optimizer.inline import Inliner, report
+from optimizer.peephole import Peephole, RULES, report as peephole_report
+
+
+def optimize(path: Path, inline: int = 8, rules: str = ','.join(RULES)) -> None:
+    program = Program.load(path)
+    before = program.size()
+
+    if inline:
+        print(report(Inliner(program, inline).run()))
+    if rules:
+        print(peephole_report(Peephole(program, rules.split(',')).run()))
+
+    print('{} -> {} commands'.format(before, program.size()))
+    program.write_to(path if path.is_dir() else path.parent)
+
+
+if __name__ == '__main__':
+    import sys
+    args = sys.argv[2:]
+    optimize(
+        Path(sys.argv[1]),
+        inline=int(args[args.index('--inline') + 1]) if '--inline' in args else 8,
+        rules=args[args.index('--rules') + 1] if '--rules' in args else ','.join(RULES)
+    )
@@ -0,0 +1,175 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from translator.commands import parse_command
+from optimizer.program import Program
+
+
+# a rule looks at the last commands emitted, split into parts, and returns
+# how many of them to replace and with what
+Rewrite = Optional[Tuple[int, List[str]]]
+Rule = Callable[[List[List[str]]], Rewrite]
+
+WINDOW = 5
+
+UNARY = {
+    'neg': lambda x: -x,
+    'not': lambda x: ~x,
+}
+
+BINARY = {
+    'add': lambda x, y: x + y,
+    'sub': lambda x, y: x - y,
+    'and': lambda x, y: x & y,
+    'or': lambda x, y: x | y,
+    'eq': lambda x, y: -(x == y),
+    'gt': lambda x, y: -(x > y),
+    'lt': lambda x, y: -(x < y),
+}
+
+
+def signed(value: int) -> int:
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def constant(value: int) -> List[str]:
+    # the shortest commands pushing a 16 bit value; push constant only
+    # takes 0..32767, any other value is the negation of one of those
+    value &= 0xFFFF
+    if value < 0x8000:
+        return ['push constant {}'.format(value)]
+    return ['push constant {}'.format(~value & 0xFFFF), 'not']
+
+
+def constant_at_end(window: List[List[str]], end: int) -> Optional[Tuple[int, int]]:
+    # (value, commands) of a constant pushed by the commands before end
+    if end >= 1 and window[end - 1][:2] == ['push', 'constant']:
+        return signed(int(window[end - 1][2])), 1
+    if end >= 2 and window[end - 1][0] in UNARY and window[end - 2][:2] == ['push', 'constant']:
+        return signed(UNARY[window[end - 1][0]](int(window[end - 2][2]))), 2
+    return None
+
+
+def push_pop(window: List[List[str]]) -> Rewrite:
+    # storing a value back where it was just read from
+    if len(window) >= 2:
+        push, pop = window[-2:]
+        if push[0] == 'push' and pop[0] == 'pop' and push[1:] == pop[1:]:
+            return 2, []
+    return None
+
+
+def fold_constants(window: List[List[str]]) -> Rewrite:
+    op = window[-1][0]
+    if op in UNARY:
+        operand = constant_at_end(window, len(window) - 1)
+        if operand is not None:
+            folded = constant(UNARY[op](operand[0]))
+            if len(folded) < operand[1] + 1:
+                return operand[1] + 1, folded
+    elif op in BINARY:
+        y = constant_at_end(window, len(window) - 1)
+        x = constant_at_end(window, len(window) - 1 - y[1]) if y is not None else None
+        if x is not None:
+            # the translator compares by the sign of x - y, which is only
+            # the true comparison while the difference fits in 16 bits
+            if op in {'eq', 'gt', 'lt'} and signed(x[0] - y[0]) != x[0] - y[0]:
+                return None
+            return x[1] + y[1] + 1, constant(BINARY[op](x[0], y[0]))
+    return None
+
+
+def double_negation(window: List[List[str]]) -> Rewrite:
+    if len(window) >= 2 and window[-1][0] in UNARY and window[-2] == window[-1]:
+        return 2, []
+    return None
+
+
+def identity(window: List[List[str]]) -> Rewrite:
+    # x + 0, x - 0, x | 0 and x & -1
+    op = window[-1][0]
+    operand = constant_at_end(window, len(window) - 1)
+    if operand is None:
+        return None
+    if (op in {'add', 'sub', 'or'} and operand[0] == 0) or (op == 'and' and operand[0] == -1):
+        return operand[1] + 1, []
+    return None
+
+
+def constant_branch(window: List[List[str]]) -> Rewrite:
+    # an if-goto on a constant either always or never jumps
+    if window[-1][0] != 'if-goto':
+        return None
+    condition = constant_at_end(window, len(window) - 1)
+    if condition is None:
+        return None
+    return condition[1] + 1, ['goto {}'.format(window[-1][1])] if condition[0] else []
+
+
+def jump_to_next(window: List[List[str]]) -> Rewrite:
+    if len(window) >= 2 and window[-2][0] == 'goto' and window[-1] == ['label', window[-2][1]]:
+        return 2, ['label {}'.format(window[-1][1])]
+    return None
+
+
+def unreachable(window: List[List[str]]) -> Rewrite:
+    # nothing after a goto or return runs until the next label or function
+    if len(window) >= 2 and window[-2][0] in {'goto', 'return'}:
+        if window[-1][0] not in {'label', 'function'}:
+            return 1, []
+    return None
+
+
+RULES = {
+    'push-pop': push_pop,
+    'fold-constants': fold_constants,
+    'double-negation': double_negation,
+    'identity': identity,
+    'constant-branch': constant_branch,
+    'jump-to-next': jump_to_next,
+    'unreachable': unreachable,
+}
+
+
+class Peephole:
+    # rewrites each file in one pass: commands are emitted one at a time,
+    # and the rules run on the tail of the output until none applies, so a
+    # rewrite can enable another on the commands before it
+    def __init__(self, program: Program, rules: Sequence[str] = tuple(RULES)) -> None:
+        for name in rules:
+            if name not in RULES:
+                raise ValueError('Unknown peephole rule {}.'.format(name))
+        self.program = program
+        self.rules = [(name, RULES[name]) for name in rules]
+        self.fired = dict((name, 0) for name in rules)
+
+    def run(self) -> Dict[str, int]:
+        for file, commands in self.program.files.items():
+            out = []
+            for command in commands:
+                out.append(command.command.split(' '))
+                self.rewrite(out)
+            self.program.files[file] = [parse_command(' '.join(parts)) for parts in out]
+        return self.fired
+
+    def rewrite(self, out: List[List[str]]) -> None:
+        changed = True
+        while changed and out:
+            changed = False
+            for name, rule in self.rules:
+                rewrite = rule(out[-WINDOW:])
+                if rewrite is not None:
+                    count, replacement = rewrite
+                    del out[len(out) - count:]
+                    out.extend(line.split(' ') for line in replacement)
+                    self.fired[name] += 1
+                    changed = True
+                    break
+
+
+def report(fired: Dict[str, int]) -> str:
+    lines = ['{:<40} {:>6}'.format('rule', 'fired')]
+    for name, count in fired.items():
+        lines.append('{:<40} {:>6}'.format(name, count))
+    lines.append('{} rewrites'.format(sum(fired.values())))
+    return '\n'.join(lines)
@@ -0,0 +1,73 @@
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+from translator.parser import Parser, SourceParser, load
+from translator.commands import Command, Context, Function as FunctionCommand
+
+
+class Function:
+    def __init__(self, file: str, name: str, n_locals: int, body: List[Command]) -> None:
+        self.file = file
+        self.name = name
+        self.n_locals = n_locals
+        self.body = body
+
+    def parts(self) -> Iterator[List[str]]:
+        for command in self.body:
+            yield command.command.split(' ')
+
+
+class Program:
+    # a whole vm program, kept as the translator's command objects per file
+    def __init__(self, parser: Parser) -> None:
+        self.files = {}
+        for file, command in parser:
+            self.files.setdefault(file, []).append(command)
+
+    @classmethod
+    def load(cls, path: Path) -> 'Program':
+        return cls(load(path))
+
+    @classmethod
+    def from_sources(cls, sources: Dict[str, Iterable[str]]) -> 'Program':
+        return cls(SourceParser(sources))
+
+    def functions(self) -> Dict[str, Function]:
+        functions = {}
+        for file, commands in self.files.items():
+            current = None
+            for command in commands:
+                if isinstance(command, FunctionCommand):
+                    name, n_locals = command.command.split(' ')[1:]
+                    current = Function(file, name, int(n_locals), [])
+                    functions[name] = current
+                elif current:
+                    current.body.append(command)
+        return functions
+
+    def sources(self) -> Dict[str, List[str]]:
+        return dict(
+            (file, [command.command for command in commands])
+            for file, commands in self.files.items()
+        )
+
+    def size(self) -> int:
+        return sum(len(commands) for commands in self.files.values())
+
+    def write_to(self, path: Path) -> None:
+        for file, lines in self.sources().items():
+            with open(path / '{}.vm'.format(file), 'w') as f:
+                f.write(''.join(line + '\n' for line in lines))
+
+
+def asm_cost(commands: Iterable[Command], file: str = '', function: str = '') -> int:
+    # hack instructions emitted for the commands, including the shared
+    # comparison routine each eq/gt/lt jumps through
+    context = Context(file, function)
+    cost = 0
+    for command in commands:
+        for line in (command.to_asm(context) + command.constant()).splitlines():
+            line = line.strip()
+            if line and not line.startswith('(') and not line.startswith('//'):
+                cost += 1
+    return cost
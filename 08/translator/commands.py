@@ -1,11 +1,43 @@
 import abc
-from typing import Optional, TypeVar
+from typing import Dict, Optional, Sequence, Tuple, TypeVar
+
+
+class Frame:
+    # what a call to a function saves after the return address, in stack
+    # order; the function's return restores the same registers. args is the
+    # function's argument count, if known. without LCL the callee never gets
+    # its own, and finds the frame above its args.
+    def __init__(self, saved: Sequence[str], args: Optional[int] = None) -> None:
+        self.saved = tuple(saved)
+        self.args = args
+
+    @property
+    def size(self) -> int:
+        return len(self.saved) + 1
+
+    def __repr__(self):
+        return 'Frame({})'.format(', '.join(self.saved))
+
+
+STANDARD_FRAME = Frame(['LCL', 'ARG', 'THIS', 'THAT'])
 
 
 class Context:
-    def __init__(self, file: str, function: str) -> None:
+    def __init__(
+        self,
+        file: str,
+        function: str,
+        frames: Optional[Dict[str, Frame]] = None,
+        loop_locals: int = 0
+    ) -> None:
         self.file = file
         self.function = function
+        self.frames = frames or {}
+        # functions with more locals than this zero them in a shared loop
+        self.loop_locals = loop_locals
+
+    def frame(self, function: str) -> Frame:
+        return self.frames.get(function, STANDARD_FRAME)
 
     def static_symbol(self, index: int) -> str:
         return '{}.{}'.format(self.file, index)
@@ -14,6 +46,15 @@ class Context:
         return '{}.{}'.format(self.function, name) if self.function else name
 
 
+# pushes a top of stack held in D
+SPILL = '''
+    @SP
+    M=M+1
+    A=M-1
+    M=D
+'''
+
+
 class Command(metaclass=abc.ABCMeta):
     def __init__(self, command: str) -> None:
         self.command = command
@@ -24,6 +65,13 @@ class Command(metaclass=abc.ABCMeta):
     def constant(self) -> str:
         return ''
 
+    def cached_asm(self, context: Context, cached: bool) -> Tuple[str, bool]:
+        # for writing with the top of the stack kept in D: cached says
+        # whether it is in D (with SP not yet counting it) before the
+        # command, the second value whether it is after. commands that don't
+        # know better put it back on the stack first.
+        return ('{}\n{}'.format(SPILL if cached else '', self.to_asm(context)), False)
+
     def __repr__(self):
         return '{}({})'.format(self.__class__.__name__, self.command)
 
@@ -35,9 +83,25 @@ class Add(Command):
             AM=M-1
             D=M
             A=A-1
-            M=M+D
+            M=D+M
         '''
 
+    def cached_asm(self, context: Context, cached: bool) -> Tuple[str, bool]:
+        if not cached:
+            return (self.to_asm(context), False)
+        return ('''
+            @SP
+            AM=M-1
+            D=D+M
+        ''', True)
+
+    def slot_asm(self, context: Context, slot: str) -> str:
+        # cached, with the value below the top in slot instead of the stack
+        return '''
+            @{}
+            D=D+M
+        '''.format(slot)
+
 class Sub(Command):
     def to_asm(self, context: Context) -> str:
         return '''
@@ -48,6 +112,22 @@ class Sub(Command):
             M=M-D
         '''
 
+    def cached_asm(self, context: Context, cached: bool) -> Tuple[str, bool]:
+        if not cached:
+            return (self.to_asm(context), False)
+        return ('''
+            @SP
+            AM=M-1
+            D=M-D
+        ''', True)
+
+    def slot_asm(self, context: Context, slot: str) -> str:
+        # cached, with the value below the top in slot instead of the stack
+        return '''
+            @{}
+            D=M-D
+        '''.format(slot)
+
 class Neg(Command):
     def to_asm(self, context: Context) -> str:
         return '''
@@ -57,6 +137,11 @@ class Neg(Command):
             M=M+1
         '''
 
+    def cached_asm(self, context: Context, cached: bool) -> Tuple[str, bool]:
+        if not cached:
+            return (self.to_asm(context), False)
+        return ('D=-D', True)
+
 class Eq(Command):
     label_count = 0
 
@@ -148,12 +233,12 @@ class Lt(Command):
             D=M
             A=A-1
             D=M-D
-            M=0
+            M=-1
             @LT_END
             D;JLT
             @SP
             A=M-1
-            M=-1
+            M=0
             (LT_END)
             @R15
             A=M
@@ -181,6 +266,22 @@ class And(Command):
             M=D&M
         '''
 
+    def cached_asm(self, context: Context, cached: bool) -> Tuple[str, bool]:
+        if not cached:
+            return (self.to_asm(context), False)
+        return ('''
+            @SP
+            AM=M-1
+            D=D&M
+        ''', True)
+
+    def slot_asm(self, context: Context, slot: str) -> str:
+        # cached, with the value below the top in slot instead of the stack
+        return '''
+            @{}
+            D=D&M
+        '''.format(slot)
+
 class Or(Command):
     def to_asm(self, context: Context) -> str:
         return '''
@@ -191,6 +292,22 @@ class Or(Command):
             M=D|M
         '''
 
+    def cached_asm(self, context: Context, cached: bool) -> Tuple[str, bool]:
+        if not cached:
+            return (self.to_asm(context), False)
+        return ('''
+            @SP
+            AM=M-1
+            D=D|M
+        ''', True)
+
+    def slot_asm(self, context: Context, slot: str) -> str:
+        # cached, with the value below the top in slot instead of the stack
+        return '''
+            @{}
+            D=D|M
+        '''.format(slot)
+
 class Not(Command):
     def to_asm(self, context: Context) -> str:
         return '''
@@ -199,6 +316,11 @@ class Not(Command):
             M=!M
         '''
 
+    def cached_asm(self, context: Context, cached: bool) -> Tuple[str, bool]:
+        if not cached:
+            return (self.to_asm(context), False)
+        return ('D=!D', True)
+
 class MemoryCommand(Command):
     REGS = {
         'local': 'LCL',
@@ -206,29 +328,52 @@ class MemoryCommand(Command):
         'this': 'THIS',
         'that': 'THAT'
     }
-    
-    def load_address(self, segment: str, index: int, context: Context) -> str:
+
+    def fixed_address(self, segment: str, index: int, context: Context) -> Optional[str]:
         if segment == 'pointer':
             return '@{}'.format(3 + index)
         elif segment == 'temp':
             return '@{}'.format(5 + index)
         elif segment == 'static':
             return '@{}'.format(context.static_symbol(index))
-        else:
-            return '''
-                @{0}
-                D=M
-                @{1}
-                A=D+A
-            '''.format(self.REGS[segment], index)
-            
+        return None
+
+    def offset_address(self, segment: str, index: int) -> str:
+        # base + index by counting up A, which leaves D alone
+        return '''
+            @{}
+            A=M{}
+            {}
+        '''.format(self.REGS[segment], '+1' if index else '', 'A=A+1\n' * (index - 1))
+
+    def load_address(self, segment: str, index: int, context: Context) -> str:
+        fixed = self.fixed_address(segment, index, context)
+        if fixed:
+            return fixed
+        return '''
+            @{0}
+            D=M
+            @{1}
+            A=D+A
+        '''.format(self.REGS[segment], index)
+
 class Push(MemoryCommand):
+    # largest index still cheaper to reach with A=A+1 than through D
+    OFFSET_LIMIT = 2
+
     def value_to_d(self, segment: str, index: int, context: Context) -> str:
         if segment == 'constant':
+            if index in (0, 1):
+                return 'D={}'.format(index)
             return '''
                 @{}
                 D=A
             '''.format(index)
+        elif segment in self.REGS and index <= self.OFFSET_LIMIT:
+            return '''
+                {}
+                D=M
+            '''.format(self.offset_address(segment, index))
         else:
             return '''
                 {}
@@ -245,23 +390,91 @@ class Push(MemoryCommand):
             M=D
         '''.format(self.value_to_d(segment, int(index), context))
 
+    def cached_asm(self, context: Context, cached: bool) -> Tuple[str, bool]:
+        segment, index = self.command.split(' ')[1:]
+        return ('{}\n{}'.format(
+            SPILL if cached else '', self.value_to_d(segment, int(index), context)
+        ), True)
+
+    def slot_asm(self, context: Context, slot: str) -> str:
+        # cached, spilling the top into slot instead of onto the stack
+        segment, index = self.command.split(' ')[1:]
+        return '''
+            @{}
+            M=D
+            {}
+        '''.format(slot, self.value_to_d(segment, int(index), context))
+
 class Pop(MemoryCommand):
+    # as for Push, with the value on the stack or already in D
+    OFFSET_LIMIT = 3
+    CACHED_OFFSET_LIMIT = 6
+
     def to_asm(self, context: Context) -> str:
         segment, index = self.command.split(' ')[1:]
+        index = int(index)
+        fixed = self.fixed_address(segment, index, context)
         if segment == 'constant':
             return ''
+        elif fixed:
+            return '''
+                @SP
+                AM=M-1
+                D=M
+                {}
+                M=D
+            '''.format(fixed)
+        elif index <= self.OFFSET_LIMIT:
+            return '''
+                @SP
+                AM=M-1
+                D=M
+                {}
+                M=D
+            '''.format(self.offset_address(segment, index))
+        # D holds address + value, so either one gives back the other
         return '''
-            {}
-            D=A
-            @R14
-            M=D
+            @{}
+            D=M
+            @{}
+            D=D+A
             @SP
             AM=M-1
-            D=M
-            @R14
-            A=M
+            D=D+M
+            A=D-M
+            M=D-A
+        '''.format(self.REGS[segment], index)
+
+    def cached_asm(self, context: Context, cached: bool) -> Tuple[str, bool]:
+        segment, index = self.command.split(' ')[1:]
+        index = int(index)
+        fixed = self.fixed_address(segment, index, context)
+        if not cached:
+            return (self.to_asm(context), False)
+        elif segment == 'constant':
+            return ('', False)
+        elif fixed:
+            return ('''
+                {}
+                M=D
+            '''.format(fixed), False)
+        elif index <= self.CACHED_OFFSET_LIMIT:
+            return ('''
+                {}
+                M=D
+            '''.format(self.offset_address(segment, index)), False)
+        # as in to_asm, with the value kept in R13
+        return ('''
+            @R13
             M=D
-        '''.format(self.load_address(segment, int(index), context))
+            @{}
+            D=D+M
+            @{}
+            D=D+A
+            @R13
+            A=D-M
+            M=D-A
+        '''.format(self.REGS[segment], index), False)
 
 class Goto(Command):
     def to_asm(self, context: Context) -> str:
@@ -278,7 +491,15 @@ class IfGoto(Command):
             D=M
             @{}
             D;JNE
-        '''.format(self.command.split(' ')[1])
+        '''.format(context.label(self.command.split(' ')[1]))
+
+    def cached_asm(self, context: Context, cached: bool) -> Tuple[str, bool]:
+        if not cached:
+            return (self.to_asm(context), False)
+        return ('''
+            @{}
+            D;JNE
+        '''.format(context.label(self.command.split(' ')[1])), False)
 
 class Label(Command):
     def to_asm(self, context: Context) -> str:
@@ -287,23 +508,67 @@ class Label(Command):
         '''.format(context.label(self.command.split()[1]))
 
 class Function(Command):
-    def push_empty(self) -> str:
+    label_count = 0
+
+    def next_label(self) -> str:
+        Function.label_count += 1
+        return 'ZERO_RET_{}'.format(Function.label_count)
+
+    def zero_routine(self) -> str:
+        # pushes D zeros, then returns to R14
         return '''
+            (ZERO_LOCALS)
             @SP
-            M=M+1
-            A=M-1
+            AM=M+1
+            A=A-1
             M=0
+            D=D-1
+            @ZERO_LOCALS
+            D;JGT
+            @R14
+            A=M
+            0;JMP
         '''
 
+    def push_empty(self, count: int) -> str:
+        # SP moves once, then the new slots are zeroed from the top down
+        if not count:
+            return ''
+        elif count <= 3:
+            bump = '@SP\n{}AM=M+1'.format('M=M+1\n' * (count - 1))
+        else:
+            bump = '''
+                @{}
+                D=A
+                @SP
+                AM=D+M
+            '''.format(count)
+        return '{}\n{}'.format(bump, 'A=A-1\nM=0\n' * count)
+
+    def loop_empty(self, count: int) -> str:
+        return '''
+            @{0}
+            D=A
+            @R14
+            M=D
+            @{1}
+            D=A
+            @ZERO_LOCALS
+            0;JMP
+            ({0})
+        '''.format(self.next_label(), count)
+
     def to_asm(self, context: Context) -> str:
         name, lcls = self.command.split(' ')[1:]
+        lcls = int(lcls)
         context.function = name
         return '''
             ({})
             {}
         '''.format(
-                name, 
-                ''.join([self.push_empty() for i in range(0, int(lcls))])
+                name,
+                self.loop_empty(lcls) if context.loop_locals and lcls > context.loop_locals
+                else self.push_empty(lcls)
             )
 
 class Call(Command):
@@ -323,8 +588,18 @@ class Call(Command):
             M=D
         '''.format(reg)
 
+    def set_lcl(self) -> str:
+        return '''
+            // set LCL
+            @SP
+            D=M
+            @LCL
+            M=D
+        '''
+
     def to_asm(self, context: Context) -> str:
         name, args = self.command.split(' ')[1:]
+        frame = context.frame(name)
         return '''
             // push return address
             @{2}
@@ -335,9 +610,6 @@ class Call(Command):
             M=D
             // push registers
             {3}
-            {4}
-            {5}
-            {6}
             // set ARG
             @{1}
             D=A
@@ -345,23 +617,17 @@ class Call(Command):
             D=M-D
             @ARG
             M=D
-            // set LCL
-            @SP
-            D=M
-            @LCL
-            M=D
+            {4}
             // jump
             @{0}
             0;JMP
             ({2})
         '''.format(
-                name, 
-                int(args) + 5,
-                self.next_label(), 
-                self.push_reg('LCL'), 
-                self.push_reg('ARG'), 
-                self.push_reg('THIS'), 
-                self.push_reg('THAT')
+                name,
+                int(args) + frame.size,
+                self.next_label(),
+                ''.join(self.push_reg(reg) for reg in frame.saved),
+                self.set_lcl() if 'LCL' in frame.saved else ''
             )
 
 class Return(Command):
@@ -376,16 +642,31 @@ class Return(Command):
             M=D
         '''.format(offset, name)
 
-    def to_asm(self, context: Context) -> str:
-        context.function = ''
+    def frame_to_r15(self, frame: Frame) -> str:
+        if 'LCL' in frame.saved:
+            return '''
+                // store LCL (R15)
+                @LCL
+                D=M
+                @R15
+                M=D
+            '''
         return '''
-            // store LCL (R15)
-            @LCL
+            // store frame above the arguments (R15)
+            @ARG
             D=M
+            @{}
+            D=D+A
             @R15
             M=D
+        '''.format(frame.args + frame.size)
+
+    def unwind(self, value: str, frame: Frame) -> str:
+        # value leaves the return value in D
+        return '''
+            {}
             // store return (R14)
-            @5
+            @{}
             D=A
             @R15
             A=M-D
@@ -393,9 +674,7 @@ class Return(Command):
             @R14
             M=D
             // pop return value
-            @SP
-            AM=M-1
-            D=M
+            {}
             @ARG
             A=M
             M=D
@@ -405,17 +684,169 @@ class Return(Command):
             @SP
             M=D+1
             {}
+            @R14
+            A=M
+            0;JMP
+        '''.format(
+                self.frame_to_r15(frame),
+                frame.size,
+                value,
+                ''.join(
+                    self.pop_reg(reg, frame.size - 1 - i)
+                    for i, reg in reversed(list(enumerate(frame.saved)))
+                )
+            )
+
+    def to_asm(self, context: Context) -> str:
+        return self.unwind('''
+            @SP
+            AM=M-1
+            D=M
+        ''', context.frame(context.function))
+
+    def cached_asm(self, context: Context, cached: bool) -> Tuple[str, bool]:
+        if not cached:
+            return (self.to_asm(context), False)
+        # D is needed to unwind the frame, so the value waits in R13
+        return ('''
+            @R13
+            M=D
+            {}
+        '''.format(self.unwind('''
+            @R13
+            D=M
+        ''', context.frame(context.function))), False)
+
+
+
+class TailCall(Command):
+    # `call f n` straight followed by `return`: f takes over the current
+    # frame and returns to our caller itself. THIS and THAT have to be
+    # restored by f if they are by the current function, otherwise it is
+    # an ordinary call and return. unless the frame can be kept as it is,
+    # replacing it costs about as much as the call and return, so that is
+    # only done for recursive calls, where it bounds the stack.
+    def __init__(self, command: str, recursive: bool = True) -> None:
+        super().__init__(command)
+        self.recursive = recursive
+
+    def possible(self, caller: Frame, callee: Frame) -> bool:
+        return all(reg in callee.saved for reg in caller.saved if reg in ('THIS', 'THAT'))
+
+    def move_down(self, count: int) -> str:
+        # the top count words of the stack to ARG onwards; R14 ends on the
+        # last word written
+        return '''
+            @SP
+            D=M
+            @{}
+            D=D-A
+            @R13
+            M=D
+            @ARG
+            D=M-1
+            @R14
+            M=D
+            {}
+        '''.format(count + 1, '''
+            @R13
+            AM=M+1
+            D=M
+            @R14
+            AM=M+1
+            M=D
+        ''' * count)
+
+    def push_d(self) -> str:
+        return '''
+            @SP
+            M=M+1
+            A=M-1
+            M=D
+        '''
+
+    def from_frame(self, offset: int) -> str:
+        return '''
+            @R15
+            D=M
+            @{}
+            A=D-A
+            D=M
+        '''.format(offset)
+
+    def to_asm(self, context: Context) -> str:
+        name, args = self.command.split(' ')[1:]
+        args = int(args)
+        caller, callee = context.frame(context.function), context.frame(name)
+        same_frame = caller.saved == callee.saved and caller.args == args
+        if not self.possible(caller, callee) or not (same_frame or self.recursive):
+            return '{}\n{}'.format(Call(self.command).to_asm(context), Return('return').to_asm(context))
+
+        if same_frame:
+            # the frame above our arguments is already the right one, only
+            # the arguments change
+            if args:
+                moved = '''
+                    {}
+                    @R14
+                    D=M+1
+                '''.format(self.move_down(args))
+            else:
+                moved = '''
+                    @ARG
+                    D=M
+                '''
+            return '''
+                // reuse frame
+                {}
+                @{}
+                D=D+A
+                @SP
+                M=D
+                {}
+                @{}
+                0;JMP
+            '''.format(moved, callee.size, '@LCL\nM=D' if 'LCL' in callee.saved else '', name)
+
+        # build the callee's frame from ours on top of the arguments, then
+        # move both down to ARG
+        header = [self.from_frame(caller.size)]
+        for reg in callee.saved:
+            if reg in caller.saved:
+                header.append(self.from_frame(caller.size - 1 - caller.saved.index(reg)))
+            else:
+                # never changed by the current function
+                header.append('''
+                    @{}
+                    D=M
+                '''.format(reg))
+        restore_lcl = ''
+        if 'LCL' in caller.saved and 'LCL' not in callee.saved:
+            restore_lcl = '''
+                {}
+                @LCL
+                M=D
+            '''.format(self.from_frame(caller.size - 1 - caller.saved.index('LCL')))
+        return '''
+            // replace frame
+            {}
             {}
             {}
             {}
             @R14
-            A=M
+            D=M+1
+            @SP
+            M=D
+            {}
+            @{}
             0;JMP
         '''.format(
-                self.pop_reg('THAT', 1),
-                self.pop_reg('THIS', 2),
-                self.pop_reg('ARG', 3),
-                self.pop_reg('LCL', 4),
+                Return('return').frame_to_r15(caller),
+                ''.join(value + self.push_d() for value in header),
+                restore_lcl,
+                self.move_down(args + callee.size),
+                '@LCL\nM=D' if 'LCL' in callee.saved else '',
+                name
             )
 
 
@@ -442,4 +873,16 @@ COMMANDS = {
 
 
 def parse_command(command: str) -> Command:
-    return COMMANDS[command.split(' ')[0]](command)
\ No newline at end of file
+    return COMMANDS[command.split(' ')[0]](command)
+
+
+def build_command(parts: Sequence) -> Command:
+    # from a command already split up, e.g. ('push', 'constant', 1)
+    return COMMANDS[parts[0]](' '.join(map(str, parts)))
+
+
+def reset_labels() -> None:
+    # numbers the labels of the commands after this from 1 again, so the
+    # output for a file doesn't depend on the files before it
+    for command in (Eq, Gt, Lt, Function, Call):
+        command.label_count = 0
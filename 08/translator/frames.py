@@ -0,0 +1,85 @@
+from typing import Collection, Dict, Set, Tuple
+
+from translator.commands import Frame, STANDARD_FRAME
+from translator.parser import Parser
+
+
+class Usage:
+    def __init__(self, local_count: int) -> None:
+        self.local_count = local_count
+        self.local_segment = False
+        self.pointers = set()
+
+
+def analyse(
+    parser: Parser,
+    keep: Collection[str] = (),
+    entry: str = 'Sys.init',
+    light: bool = True
+) -> Dict[str, Frame]:
+    # the frame and, where all calls agree, the argument count of each
+    # function. light frames are the lightest each function can do with:
+    # THIS and THAT are only saved for functions that set them, and
+    # functions without locals and with a known argument count don't need
+    # LCL. the entry, functions in keep (e.g. ones run natively) and
+    # functions never called here, whose callers are unknown, get the
+    # standard frame.
+    usage = {}
+    args = {}
+    current = None
+    for file, command in parser:
+        parts = command.command.split(' ')
+        if parts[0] == 'function':
+            current = usage.setdefault(parts[1], Usage(int(parts[2])))
+        elif parts[0] == 'call':
+            args.setdefault(parts[1], set()).add(int(parts[2]))
+        elif parts[0] in ('push', 'pop') and current is not None:
+            if parts[1] == 'local':
+                current.local_segment = True
+            elif parts[1] == 'pointer' and parts[0] == 'pop':
+                current.pointers.add(int(parts[2]))
+
+    frames = {}
+    for name, used in usage.items():
+        if name == entry or name in keep or name not in args:
+            frames[name] = STANDARD_FRAME
+            continue
+        arity = min(args[name]) if len(args[name]) == 1 else None
+        if not light:
+            frames[name] = Frame(STANDARD_FRAME.saved, arity)
+            continue
+        frameless = not used.local_count and not used.local_segment and arity is not None
+        saved = [] if frameless else ['LCL']
+        saved.append('ARG')
+        saved.extend(reg for pointer, reg in enumerate(['THIS', 'THAT']) if pointer in used.pointers)
+        frames[name] = Frame(saved, arity)
+    return frames
+
+
+def recursive_calls(parser: Parser) -> Set[Tuple[str, str]]:
+    # (caller, callee) for the calls that can lead back to the caller
+    calls = {}
+    current = None
+    for file, command in parser:
+        parts = command.command.split(' ')
+        if parts[0] == 'function':
+            current = parts[1]
+        elif parts[0] == 'call' and current is not None:
+            calls.setdefault(current, set()).add(parts[1])
+
+    def reaches(start: str) -> Set[str]:
+        seen = set()
+        todo = [start]
+        while todo:
+            for callee in calls.get(todo.pop(), ()):
+                if callee not in seen:
+                    seen.add(callee)
+                    todo.append(callee)
+        return seen
+
+    return {
+        (caller, callee)
+        for caller, callees in calls.items()
+        for callee in callees
+        if callee == caller or caller in reaches(callee)
+    }
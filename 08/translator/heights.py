@@ -0,0 +1,171 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from translator.commands import Command, Frame, TailCall, STANDARD_FRAME
+from translator.parser import Parser
+
+
+# (values popped, values pushed) by each command; calls are worked out
+# from their argument count
+EFFECTS = {
+    'push': (0, 1),
+    'pop': (1, 0),
+    'add': (2, 1),
+    'sub': (2, 1),
+    'and': (2, 1),
+    'or': (2, 1),
+    'eq': (2, 1),
+    'gt': (2, 1),
+    'lt': (2, 1),
+    'neg': (1, 1),
+    'not': (1, 1),
+    'if-goto': (1, 0),
+    'goto': (0, 0),
+    'label': (0, 0),
+    'function': (0, 0),
+    'return': (1, 0),
+}
+
+
+def effect(command: Command) -> Tuple[int, int]:
+    parts = command.command.split(' ')
+    if isinstance(command, TailCall):
+        return (int(parts[2]), 0)
+    elif parts[0] == 'call':
+        return (int(parts[2]), 1)
+    return EFFECTS[parts[0]]
+
+
+class Heights:
+    # the stack height (values above the locals) before each command of a
+    # function, None where the command can't be reached. the height at a
+    # label has to be the same from everywhere it is reached from, or the
+    # function is inconsistent and errors says where.
+    def __init__(self, name: str, commands: Sequence[Command]) -> None:
+        self.name = name
+        self.commands = list(commands)
+        self.locals = 0
+        if self.commands and self.commands[0].command.startswith('function '):
+            self.locals = int(self.commands[0].command.split(' ')[2])
+        self.heights = [None] * len(self.commands)
+        self.max_height = 0
+        # (height before the call, callee, argument count)
+        self.calls = []
+        self.errors = []
+        self.analyse()
+
+    def analyse(self) -> None:
+        labels = {}
+        for index, command in enumerate(self.commands):
+            parts = command.command.split(' ')
+            if parts[0] == 'label':
+                labels[parts[1]] = index
+
+        pending = [(0, 0)] if self.commands else []
+        while pending:
+            index, height = pending.pop()
+            while index < len(self.commands):
+                command = self.commands[index]
+                parts = command.command.split(' ')
+                if self.heights[index] is not None:
+                    if self.heights[index] != height:
+                        self.errors.append('label {} reached with heights {} and {}'.format(
+                            parts[1], self.heights[index], height
+                        ))
+                    break
+                self.heights[index] = height
+                popped, pushed = effect(command)
+                if popped > height:
+                    self.errors.append('{} pops {} values from a stack of {}'.format(
+                        command.command, popped, height
+                    ))
+                    break
+                if parts[0] == 'call':
+                    self.calls.append((height, parts[1], int(parts[2])))
+                height += pushed - popped
+                self.max_height = max(self.max_height, height)
+
+                if parts[0] in ('goto', 'if-goto'):
+                    if parts[1] in labels:
+                        pending.append((labels[parts[1]], height))
+                    else:
+                        self.errors.append('no label {}'.format(parts[1]))
+                if parts[0] in ('goto', 'return') or isinstance(command, TailCall):
+                    break
+                index += 1
+
+    @property
+    def consistent(self) -> bool:
+        return not self.errors
+
+
+def split_functions(commands: Sequence[Command]) -> List[Tuple[str, List[Command]]]:
+    # commands before the first function (as in the single file tests) go
+    # under ''
+    functions = []
+    for command in commands:
+        if command.command.startswith('function ') or not functions:
+            name = command.command.split(' ')[1] if command.command.startswith('function ') else ''
+            functions.append((name, []))
+        functions[-1][1].append(command)
+    return functions
+
+
+def analyse(parser: Parser) -> Dict[str, Heights]:
+    return dict(
+        (name, Heights(name, commands))
+        for name, commands in split_functions([command for file, command in parser])
+    )
+
+
+def depths(
+    functions: Dict[str, Heights],
+    frames: Optional[Dict[str, Frame]] = None
+) -> Dict[str, Optional[int]]:
+    # words of stack a function and everything it calls can use, from its
+    # locals up; None if it can end up in recursion. functions that aren't
+    # part of the program (e.g. run natively) count as using none beyond
+    # their frame.
+    frames = frames or {}
+    result = {}
+
+    def depth(name: str, active: Tuple[str, ...]) -> Optional[int]:
+        if name in active:
+            return None
+        if name in result:
+            return result[name]
+        function = functions[name]
+        deepest = function.max_height
+        for height, callee, args in function.calls:
+            below = depth(callee, active + (name,)) if callee in functions else 0
+            if below is None:
+                deepest = None
+                break
+            size = frames.get(callee, STANDARD_FRAME).size
+            deepest = max(deepest, height + size + below)
+        result[name] = None if deepest is None else function.locals + deepest
+        return result[name]
+
+    for name in functions:
+        depth(name, ())
+    return result
+
+
+def report(functions: Dict[str, Heights], frames: Optional[Dict[str, Frame]] = None) -> str:
+    stack = depths(functions, frames)
+    lines = ['{:<40} {:>6} {:>10} {:>10}'.format('function', 'locals', 'max height', 'depth')]
+    for name, function in sorted(functions.items()):
+        lines.append('{:<40} {:>6} {:>10} {:>10}'.format(
+            name or '(top level)', function.locals, function.max_height,
+            'recursive' if stack[name] is None else stack[name]
+        ))
+        for error in function.errors:
+            lines.append('    {}'.format(error))
+    if 'Sys.init' in stack:
+        # the bootstrap calls Sys.init with SP at 256
+        worst = stack['Sys.init']
+        if worst is None:
+            lines.append('worst case stack: unbounded (recursion)')
+        else:
+            worst += STANDARD_FRAME.size
+            lines.append('worst case stack: {} words, up to RAM[{}]'.format(worst, 256 + worst - 1))
+    return '\n'.join(lines)
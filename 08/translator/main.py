@@ -2,17 +2,54 @@ from pathlib import Path
 
 from translator.writer import Writer
 from translator.parser import load
+from translator.heights import analyse, report
 
 
-def translate(path: Path):
-    writer = Writer(load(path))
+def translate(
+    path: Path,
+    source_map: bool = False,
+    cache_top: bool = False,
+    light_frames: bool = False,
+    tail_calls: bool = False,
+    stack_slots: bool = False,
+    heights: bool = False,
+    loop_locals: int = 0,
+    split: bool = False
+):
+    writer = Writer(
+        load(path), cache_top, light_frames, tail_calls=tail_calls, stack_slots=stack_slots,
+        loop_locals=loop_locals
+    )
     if path.is_dir():
         out_path = path / '{}.asm'.format(path.parts[-1])
     else:
         out_path = path.parent / '{}.asm'.format(path.parts[-1].replace('.vm', ''))
-    writer.write_to(out_path)
+    if split:
+        # the files to link, in order
+        runtime = '{}.runtime'.format(out_path.stem)
+        for written in writer.write_files(out_path.parent, runtime, source_map):
+            print(written)
+    else:
+        writer.write_to(out_path)
+        if source_map:
+            writer.write_map(out_path.with_suffix('.asm.map'))
+    if heights:
+        print(report(analyse(load(path)), writer.frames))
 
 
 if __name__ == '__main__':
     import sys
-    translate(Path(sys.argv[1]))
+    args = sys.argv[2:]
+    translate(
+        Path(sys.argv[1]),
+        '--map' in args,
+        # stack slots only apply with the top cached. they take up to 8 of
+        # the 240 static words, right after the statics.
+        cache_top='--cache-top' in args or '--stack-slots' in args,
+        light_frames='--light-frames' in args,
+        tail_calls='--tail-calls' in args,
+        stack_slots='--stack-slots' in args,
+        heights='--heights' in args,
+        loop_locals=int(args[args.index('--loop-locals') + 1]) if '--loop-locals' in args else 0,
+        split='--split' in args
+    )
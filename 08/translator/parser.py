@@ -1,16 +1,23 @@
 import re
 import abc
 from pathlib import Path
-from typing import Iterator, Tuple
+from typing import Dict, Iterable, Iterator, Tuple
 
 from translator.commands import Command, parse_command
 
 
 class Parser(metaclass=abc.ABCMeta):
+    # source line (0-based) of the command last returned
+    line = 0
+
     @abc.abstractmethod
     def __iter__(self) -> Iterator[Tuple[str, Command]]: ...
 
 
+def trim_line(line: str) -> str:
+    return re.sub(r'(^\s*)|(\s*$)', '', re.sub(r'(//.*)', '', line))
+
+
 class FileParser(Parser):
     def __init__(self, fin: Path) -> None:
         self.path = fin
@@ -19,10 +26,13 @@ class FileParser(Parser):
     def __iter__(self) -> Iterator[Tuple[str, Command]]:
         self.f = open(self.path)
         self.f.seek(0)
+        self.next_line = 0
         return self
 
     def __next__(self) -> Tuple[str, Command]:
         for line in self.f:
+            self.line = self.next_line
+            self.next_line += 1
             trimmed = self.trim_line(line)
             if trimmed != '':
                 return (self.name, parse_command(trimmed))
@@ -30,7 +40,7 @@ class FileParser(Parser):
         raise StopIteration
 
     def trim_line(self, line: str) -> str:
-        return re.sub(r'(^\s*)|(\s*$)', '', re.sub(r'(//.*)', '', line))
+        return trim_line(line)
 
 
 class DirectoryParser(Parser):
@@ -48,8 +58,40 @@ class DirectoryParser(Parser):
         except StopIteration:
             self.current = iter(FileParser(self.source_iter.__next__()));
             return self.__next__()
+
+    @property
+    def line(self) -> int:
+        return self.current.line
          
 
+class SourceParser(Parser):
+    # vm programs already in memory, e.g. straight from the compiler,
+    # keyed by file name (which scopes their statics)
+    def __init__(self, sources: Dict[str, Iterable[str]]) -> None:
+        self.sources = sources
+
+    def __iter__(self) -> Iterator[Tuple[str, Command]]:
+        for name, lines in self.sources.items():
+            for number, line in enumerate(lines):
+                trimmed = trim_line(line)
+                if trimmed != '':
+                    self.line = number
+                    yield (name, parse_command(trimmed))
+
+
+class CommandParser(Parser):
+    # vm programs already parsed, e.g. built from the compiler's commands,
+    # as (source line, command) pairs keyed by file name
+    def __init__(self, sources: Dict[str, Iterable[Tuple[int, Command]]]) -> None:
+        self.sources = sources
+
+    def __iter__(self) -> Iterator[Tuple[str, Command]]:
+        for name, commands in self.sources.items():
+            for number, command in commands:
+                self.line = number
+                yield (name, command)
+
+
 def load(path: Path) -> Parser:
     if path.is_dir():
         return DirectoryParser(path)
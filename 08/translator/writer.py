@@ -1,13 +1,51 @@
 import re
 from pathlib import Path
+from typing import Collection, Iterator, List, Optional, Tuple
 
 from translator.parser import Parser
-from translator.commands import COMMANDS, Context, Call
+from translator.commands import (
+    COMMANDS, SPILL, Command, Context, Add, And, Call, Function, Neg, Not, Or, Pop, Push,
+    Return, Sub, TailCall, reset_labels
+)
+from translator.frames import analyse, recursive_calls
+from translator.heights import Heights, effect, split_functions
+from translator.sourcemap import SourceMap
 
 
 class Writer:
-    def __init__(self, parser: Parser) -> None:
+    # stack slots, by height, take the words right after the statics, so
+    # those keep the addresses they have without slots. they come out of
+    # the 240 static words, and heights that don't fit aren't slotted.
+    SLOTS = 8
+    STATIC_END = 256
+
+    def __init__(
+        self,
+        parser: Parser,
+        cache_top: bool = False,
+        light_frames: bool = False,
+        keep_frames: Collection[str] = (),
+        tail_calls: bool = False,
+        stack_slots: bool = False,
+        loop_locals: int = 0
+    ) -> None:
         self.parser = parser
+        # keep the top of the stack in D between commands where possible
+        self.cache_top = cache_top
+        # save only the registers each function needs in its calls, except
+        # for the functions in keep_frames
+        self.frames = {}
+        if light_frames or tail_calls:
+            self.frames = analyse(parser, keep_frames, light=light_frames)
+        # `call` + `return` reuses the current frame
+        self.tail_calls = tail_calls
+        self.recursive = recursive_calls(parser) if tail_calls else set()
+        # with the top cached, a value spilled only to be the second operand
+        # of add, sub, and or or goes to a fixed slot instead of the stack
+        self.stack_slots = stack_slots and cache_top
+        # functions with more locals than this zero them in a shared loop
+        # rather than inline, which is smaller but slower
+        self.loop_locals = loop_locals
 
     def clean_asm(self, asm: str) -> str:
         return '\n'.join([s for s in asm.replace(' ', '').splitlines() if s])
@@ -21,22 +59,170 @@ class Writer:
         '''
 
     def init_section(self) -> str:
-        constants = ''.join([c('').constant() for c in COMMANDS.values()])
-        return '''
-            {}
-            {}
-            {}
-        '''.format(
-                self.init_asm(), 
-                Call('call Sys.init 0').to_asm(Context('', '')), 
-                constants
-            )
+        return '{}\n{}'.format(
+            self.init_asm(),
+            Call('call Sys.init 0').to_asm(Context('', '', self.frames))
+        )
 
-    def write_to(self, path: Path) -> None:
-        f = open(path, 'w')
-        context = Context('', '')
-        f.write(self.clean_asm(self.init_section()) + '\n')
+    def commands(self) -> Iterator[Tuple[str, Command, int]]:
+        # (file, command, source line), with calls in tail position fused
+        # with their return
+        pending = None
+        function = ''
         for file, command in self.parser:
+            line = self.parser.line
+            if pending and isinstance(command, Return):
+                callee = pending[1].command.split(' ')[1]
+                recursive = (function, callee) in self.recursive
+                yield (pending[0], TailCall(pending[1].command, recursive), pending[2])
+                pending = None
+                continue
+            if isinstance(command, Function):
+                function = command.command.split(' ')[1]
+            if pending:
+                yield pending
+                pending = None
+            if self.tail_calls and isinstance(command, Call):
+                pending = (file, command, line)
+            else:
+                yield (file, command, line)
+        if pending:
+            yield pending
+
+    def sections(self, per_file: bool = False) -> Iterator[Tuple[str, str, str, int, str]]:
+        # (file, asm, source, source line, name) for each piece of output;
+        # the runtime sections come first, under file '' and named after
+        # themselves, with no source. per_file numbers labels from 1 again
+        # in each file, for assembling the files separately.
+        if per_file:
+            reset_labels()
+        chunks = [('$init', self.init_section())]
+        for name, command in COMMANDS.items():
+            constant = command('').constant()
+            if constant:
+                chunks.append(('${}'.format(name), constant))
+        if self.loop_locals:
+            chunks.append(('$zero', Function('').zero_routine()))
+        for name, asm in chunks:
+            yield ('', self.clean_asm(asm), '', 0, name)
+
+        context = Context('', '', self.frames, self.loop_locals)
+        cached = False
+        commands = list(self.commands())
+        heights = self.heights(commands) if self.stack_slots else []
+        self.slot_base = 16 + self.static_count(commands)
+        operands = {}
+        last = None
+        for index, (file, command, line) in enumerate(commands):
+            if per_file and last is not None and file != last[0]:
+                if cached:
+                    yield (last[0], self.clean_asm(SPILL)) + last[1:]
+                    cached = False
+                reset_labels()
             context.file = file
-            f.write(self.clean_asm(command.to_asm(context)) + '\n')
-        f.close()
+            user = self.slot_user(commands, heights, index) if cached else None
+            if user is not None:
+                operands[user] = str(self.slot_base + heights[index] - 1)
+                asm, cached = command.slot_asm(context, operands[user]), True
+            elif index in operands:
+                asm, cached = command.slot_asm(context, operands.pop(index)), True
+            elif self.cache_top:
+                asm, cached = command.cached_asm(context, cached)
+            else:
+                asm = command.to_asm(context)
+            last = (file, '{}.vm'.format(file), line, context.function)
+            yield (last[0], self.clean_asm(asm)) + last[1:]
+        if cached:
+            yield (last[0], self.clean_asm(SPILL)) + last[1:]
+
+    def __iter__(self) -> Iterator[str]:
+        # source_map gets the vm line and function of each asm line
+        self.source_map = SourceMap()
+        asm_line = 0
+        for file, asm, source, line, name in self.sections():
+            self.source_map.add(asm_line, source, line, name)
+            asm_line += len(asm.splitlines())
+            yield asm
+
+    def heights(self, commands: List[Tuple[str, Command, int]]) -> List[Optional[int]]:
+        # the stack height before each command, or None throughout
+        # functions whose heights aren't consistent
+        heights = []
+        for name, function in split_functions([command for file, command, line in commands]):
+            analysed = Heights(name, function)
+            heights.extend(analysed.heights if analysed.consistent else [None] * len(function))
+        return heights
+
+    def static_count(self, commands: List[Tuple[str, Command, int]]) -> int:
+        # the static variables the assembler will allocate from 16
+        return len(set(
+            (file, command.command.split(' ')[2])
+            for file, command, line in commands
+            if isinstance(command, (Push, Pop)) and command.command.split(' ')[1] == 'static'
+        ))
+
+    def slot_user(
+        self,
+        commands: List[Tuple[str, Command, int]],
+        heights: List[Optional[int]],
+        index: int
+    ) -> Optional[int]:
+        # the add, sub, and or or that takes the value a push at index
+        # spills as the operand below a cached top, if the commands in
+        # between only use the stack above it. the value can then be left
+        # in the slot for its height.
+        if not heights or heights[index] is None or not isinstance(commands[index][1], Push):
+            return None
+        position = heights[index] - 1
+        if position < 0 or position >= self.SLOTS or self.slot_base + position >= self.STATIC_END:
+            return None
+        height = position + 2
+        cached = True
+        for later in range(index + 1, len(commands)):
+            command = commands[later][1]
+            popped, pushed = effect(command)
+            if height - popped <= position:
+                if cached and height - 2 == position and isinstance(command, (Add, Sub, And, Or)):
+                    return later
+                return None
+            if isinstance(command, Push):
+                cached = True
+            elif isinstance(command, Pop):
+                cached = False
+            elif not isinstance(command, (Add, Sub, And, Or, Neg, Not)):
+                return None
+            height += pushed - popped
+        return None
+
+    def lines(self) -> Iterator[str]:
+        for asm in self:
+            yield from asm.splitlines()
+
+    def write_to(self, path: Path) -> None:
+        with open(path, 'w') as f:
+            for line in self.lines():
+                f.write(line + '\n')
+
+    def write_map(self, path: Path) -> None:
+        self.source_map.write_to(path)
+
+    def write_files(self, directory: Path, runtime: str, source_map: bool = False) -> List[Path]:
+        # one .asm per .vm file, to be assembled separately and linked, with
+        # the runtime sections in runtime.asm; that has to be linked first,
+        # as it starts with the bootstrap. returns the files in that order.
+        outputs = {}
+        maps = {}
+        for file, asm, source, line, name in self.sections(per_file=True):
+            lines = outputs.setdefault(file or runtime, [])
+            maps.setdefault(file or runtime, SourceMap()).add(len(lines), source, line, name)
+            lines.extend(asm.splitlines())
+        paths = []
+        for file, lines in outputs.items():
+            path = directory / '{}.asm'.format(file)
+            with open(path, 'w') as f:
+                for line in lines:
+                    f.write(line + '\n')
+            if source_map:
+                maps[file].write_to(path.with_suffix('.asm.map'))
+            paths.append(path)
+        return paths
@@ -1,91 +1,52 @@
-from typing import Iterator, Type, List, Union, Set, Optional
+from typing import List, Optional, Tuple
 
 from pathlib import Path
-from textwrap import indent
-from enum import Enum
 
-from compile.symbol_table import SymbolTable
+from compile.symbol_table import SymbolTable, Symbol
 from compile.tokenizer import Tokenizer
+from compile.parser import Parser, CompilerError
 from compile.writer import VMWriter
-from compile.token import *
 from compile.syntax import *
-
-
-class CompilerError(Exception):
-    def __init__(self, line: int, message: str) -> None:
-        super().__init__('Line {}: {}'.format(line, message))
+from compile.nodes import *
 
 
 class Compiler:
-    CLASS_VAR_DEC = {KeywordEnum.STATIC, KeywordEnum.FIELD}
-    SUBROUTINE_DEC = {KeywordEnum.CONSTRUCTOR, KeywordEnum.FUNCTION, KeywordEnum.METHOD}
-    VAR_TYPES = {KeywordEnum.INT, KeywordEnum.CHAR, KeywordEnum.BOOLEAN, TokenEnum.IDENTIFIER}
-    FUNCTION_TYPES = {KeywordEnum.VOID} | VAR_TYPES
-    STATEMENTS = {KeywordEnum.LET, KeywordEnum.IF, KeywordEnum.WHILE, KeywordEnum.DO, KeywordEnum.RETURN}
-    TERM_OPEN = set('(')
-    UNARY_OP = set('-~')
     BINARY_OP = set('+-*/&|<>=')
-    ALL_OPS = BINARY_OP | UNARY_OP
-    EXPR_CONST = {KeywordEnum.TRUE, KeywordEnum.FALSE, KeywordEnum.NULL, KeywordEnum.THIS, TokenEnum.INT_CONST, TokenEnum.STRING_CONST}
-    TERM = {TokenEnum.IDENTIFIER} | UNARY_OP | TERM_OPEN | EXPR_CONST
-    SUB_CALL = set('(.')
+    UNARY_OP = set('-~')
 
-    def __init__(self, tokenizer: Tokenizer) -> None:
+    def __init__(self, tokenizer: Tokenizer, pool_strings: bool = False) -> None:
         self.tokenizer = tokenizer
-    
-    def write_to(self, outf: Path) -> None:
-        self.class_name = None
+        # build each string literal once into a hidden static instead of on
+        # every evaluation; the pooled strings are shared, so code mutating
+        # or disposing literals must leave this off
+        self.pool_strings = pool_strings
+
+    def parse(self) -> Class:
+        return Parser(self.tokenizer).parse()
+
+    def compile(self, tree: Optional[Class] = None) -> VMWriter:
+        self.writer = VMWriter()
+        self.compile_class(tree if tree else self.parse())
+        return self.writer
+
+    def write_to(self, outf: Path, tree: Optional[Class] = None, source_map: bool = False) -> None:
+        writer = self.compile(tree)
+        writer.write_to(outf)
+        if source_map:
+            writer.write_map(outf.with_suffix('.vm.map'), self.tokenizer.file.name)
+
+    def compile_class(self, tree: Class) -> None:
+        self.class_name = tree.name
         self.symbol_table = SymbolTable()
         self.label_count = 0
+        self.string_pool = {}
+        self.that_base = None
+        self.line = self.writer.line = tree.line
 
-        self.tokens = iter(self.tokenizer)
-        self.next() # pre-load first token
-
-        self.writer = VMWriter(outf)
-        self.outf = open(outf, 'w')
-        self.compile_file()
-        self.outf.close()
-
-    def compile_file(self) -> None:
-        self.compile_class()
-
-    def next(self) -> None:
-        try:
-            self.current = next(self.tokens)
-        except StopIteration:
-            raise CompilerError(self.current.line, 'Unexpected EOF.')
-
-    def current_is(self, options: Union[
-        TokenEnum, KeywordEnum, str, 
-        Set[Union[TokenEnum, KeywordEnum, str]]
-    ]) -> bool:
-        if not isinstance(options, set):
-            options = {options}
-        if self.current.kind in options:
-            return True
-        elif self.current.kind == TokenEnum.KEYWORD:
-            return self.current.enum in options
-        elif self.current.kind == TokenEnum.SYMBOL:
-            return self.current.token in options
-
-    def discard_if(self, options: Union[
-        TokenEnum, KeywordEnum, str, 
-        Set[Union[TokenEnum, KeywordEnum, str]]
-    ]) -> Token:
-        if self.current_is(options):
-            token = self.current
-            self.next()
-            return token
-        else:
-            if not isinstance(options, set):
-                options = {options}
-            self.raise_unexpected([o.name if isinstance(o, Enum) else o for o in options])
-
-    def raise_unexpected(self, expected: Set[str]) -> None:
-        raise CompilerError(self.current.line, 'Expected {}, got {} instead.'.format(
-            '|'.join(expected),
-            self.current.token
-        ))
+        for var_dec in tree.var_decs:
+            self.compile_class_var_dec(var_dec)
+        for subroutine in tree.subroutines:
+            self.compile_subroutine_dec(subroutine)
 
     def find_in_scope(self, name: str) -> Optional[Symbol]:
         return self.symbol_table.find(name)
@@ -93,7 +54,7 @@ class Compiler:
     def get_in_scope(self, name: str) -> Symbol:
         symbol = self.find_in_scope(name)
         if not symbol:
-            raise CompilerError(self.current.line, '\'{}\' not in scope.'.format(name))
+            raise CompilerError(self.line, '\'{}\' not in scope.'.format(name))
         return symbol
 
     def push_var(self, name: str) -> None:
@@ -109,6 +70,8 @@ class Compiler:
 
     def pop_var(self, name: str) -> None:
         symbol = self.get_in_scope(name)
+        if name == self.that_base:
+            self.that_base = None
         if symbol.kind == IdentEnum.FIELD:
             self.writer.pop_this(symbol.index)
         elif symbol.kind == IdentEnum.STATIC:
@@ -118,77 +81,59 @@ class Compiler:
         else:
             self.writer.pop_local(symbol.index)
 
+    def set_that(self, name: str) -> None:
+        # pointer 1 survives calls (THAT is part of the saved frame), so the
+        # array currently in it can be reused until the variable is
+        # reassigned, control flow merges, or a callee could have changed it
+        if self.that_base != name:
+            self.push_var(name)
+            self.writer.pop_pointer(1)
+            self.that_base = name
+
+    def call(self, name: str, args: int) -> None:
+        self.writer.w_call(name, args)
+        if self.that_base and self.get_in_scope(self.that_base).kind in {IdentEnum.STATIC, IdentEnum.FIELD}:
+            self.that_base = None
+
     def get_label_id(self) -> int:
         self.label_count += 1
         return self.label_count
 
-    def compile_class(self) -> None:
-        self.discard_if(KeywordEnum.CLASS)
-        self.class_name = self.discard_if(TokenEnum.IDENTIFIER).token
-        self.discard_if('{')
-
-        while not self.current_is(self.SUBROUTINE_DEC | {'}'}):
-            self.compile_class_var_dec()
-        while not self.current_is('}'):
-            self.compile_subroutine_dec()
-         
-        # can't iterate, will raise stop iteration
-        if not self.current_is('}'):
-            raise CompilerError(self.current.line, 'Unexpected EOF.')
-
-    def compile_type(self, function: bool = False) -> str:
-        types = self.FUNCTION_TYPES if function else self.VAR_TYPES
-        return self.discard_if(types).token
-            
-    def compile_class_var_dec(self) -> None:
-        if self.current_is(KeywordEnum.FIELD):
-            var_kind = IdentEnum.FIELD
-        if self.current_is(KeywordEnum.STATIC):
-            var_kind = IdentEnum.STATIC
-        self.discard_if(self.CLASS_VAR_DEC)
-        self.compile_var_list(var_kind)
-
-    def compile_var_list(self, var_kind: IdentEnum) -> None:
-        tpe = self.compile_type()
-
-        name = self.discard_if(TokenEnum.IDENTIFIER).token
-        self.symbol_table.register(name, tpe, var_kind)
-        while not self.current_is(';'):
-            self.next()
-            name = self.discard_if(TokenEnum.IDENTIFIER).token
-            self.symbol_table.register(name, tpe, var_kind)
-            
-        self.discard_if(';')
-
-    def compile_subroutine_dec(self) -> None:
-        self.symbol_table.reset_function_scope()
+    def compile_class_var_dec(self, var_dec: VarDec) -> None:
+        if var_dec.kind == KeywordEnum.FIELD:
+            self.compile_var_list(var_dec, IdentEnum.FIELD)
+        else:
+            self.compile_var_list(var_dec, IdentEnum.STATIC)
 
-        sub_kind = self.discard_if(self.SUBROUTINE_DEC)
-        ret_kind = self.compile_type(True)
-        sub_name = self.discard_if(TokenEnum.IDENTIFIER).token
+    def compile_var_list(self, var_dec: VarDec, var_kind: IdentEnum) -> None:
+        for name in var_dec.names:
+            self.symbol_table.register(name, var_dec.tpe, var_kind)
 
-        if sub_kind.enum == KeywordEnum.METHOD:
+    def compile_subroutine_dec(self, subroutine: Subroutine) -> None:
+        self.symbol_table.reset_function_scope()
+        self.that_base = None
+        self.line = self.writer.line = subroutine.line
+
+        if subroutine.kind == KeywordEnum.METHOD:
             self.symbol_table.register('this', self.class_name, IdentEnum.ARG)
 
-        self.compile_parameter_list()
-        self.discard_if('{')
+        for param in subroutine.params:
+            self.symbol_table.register(param.name, param.tpe, IdentEnum.ARG)
+        for var_dec in subroutine.var_decs:
+            self.compile_var_list(var_dec, IdentEnum.VAR)
 
-        while not self.current_is({'}'} | self.STATEMENTS):
-            self.compile_var_dec()
+        if subroutine.kind == KeywordEnum.FUNCTION:
+            self.compile_function_setup(subroutine.name)
+        elif subroutine.kind == KeywordEnum.METHOD:
+            self.compile_method_setup(subroutine.name)
+        elif subroutine.kind == KeywordEnum.CONSTRUCTOR:
+            self.compile_constructor_setup(subroutine.name)
 
-        if sub_kind.enum == KeywordEnum.FUNCTION:
-            self.compile_function_setup(sub_name)
-        elif sub_kind.enum == KeywordEnum.METHOD:
-            self.compile_method_setup(sub_name)
-        elif sub_kind.enum == KeywordEnum.CONSTRUCTOR:
-            self.compile_constructor_setup(sub_name)
-        
-        self.compile_statements()
-        self.discard_if('}')
+        self.compile_statements(subroutine.statements)
 
     def compile_function_setup(self, name: str) -> None:
         self.writer.w_function(
-            '{}.{}'.format(self.class_name, name), 
+            '{}.{}'.format(self.class_name, name),
             self.symbol_table.count_of(IdentEnum.VAR)
         )
 
@@ -200,228 +145,249 @@ class Compiler:
     def compile_constructor_setup(self, name: str) -> None:
         self.compile_function_setup(name)
         self.writer.push_const(self.symbol_table.count_of(IdentEnum.FIELD))
-        self.writer.w_call('Memory.alloc', 1)
+        self.call('Memory.alloc', 1)
         self.writer.pop_pointer(0)
 
-    def compile_parameter_list(self) -> None:
-        self.discard_if('(')
-        
-        while not self.current_is(')'):
-            if self.current_is(','):
-                self.next()
-            tpe = self.compile_type()
-            name = self.discard_if(TokenEnum.IDENTIFIER).token
-            self.symbol_table.register(name, tpe, IdentEnum.ARG)
-
-        self.discard_if(')')
-            
-    def compile_var_dec(self) -> None:
-        self.discard_if(KeywordEnum.VAR)
-        self.compile_var_list(IdentEnum.VAR)
-        
-    def compile_statements(self) -> None:
-        self.compile_statement()
-        while self.current_is(self.STATEMENTS):
-            self.compile_statement()
-
-    def compile_statement(self) -> None:
-        if self.current_is(KeywordEnum.LET):
-            self.compile_let()
-        elif self.current_is(KeywordEnum.IF):
-            self.compile_if()
-        elif self.current_is(KeywordEnum.WHILE):
-            self.compile_while()
-        elif self.current_is(KeywordEnum.DO):
-            self.compile_do()
-        elif self.current_is(KeywordEnum.RETURN):
-            self.compile_return()
+    def compile_statements(self, statements: List[Node]) -> None:
+        for statement in statements:
+            self.compile_statement(statement)
+
+    def compile_statement(self, statement: Node) -> None:
+        self.line = self.writer.line = statement.line
+        if isinstance(statement, Let):
+            self.compile_let(statement)
+        elif isinstance(statement, If):
+            self.compile_if(statement)
+        elif isinstance(statement, While):
+            self.compile_while(statement)
+        elif isinstance(statement, Do):
+            self.compile_do(statement)
+        elif isinstance(statement, Return):
+            self.compile_return(statement)
         else:
             raise CompilerError(
-                self.current.line, 
-                'Expected let|if|while|do|return, got {} instead.'.format(self.current)
+                statement.line,
+                'Expected let|if|while|do|return, got {} instead.'.format(statement)
             )
-            
-    def compile_let(self) -> None:
-        self.discard_if(KeywordEnum.LET)
-        name = self.discard_if(TokenEnum.IDENTIFIER).token
-        is_array = False
-        
-        if self.current_is('['):
-            is_array = True
-            self.discard_if('[')
-            self.compile_expression()
-            self.discard_if(']')
-            self.writer.pop_temp(0)
-            
-        self.discard_if('=')
-        self.compile_expression()
-
-        if is_array:
-            self.push_var(name)
-            self.writer.push_temp(0)
+
+    def compile_let(self, let: Let) -> None:
+        if not let.index:
+            self.compile_expression(let.value)
+            self.pop_var(let.name)
+        elif isinstance(let.index.term, IntConstant) and not let.index.ops:
+            self.compile_expression(let.value)
+            self.set_that(let.name)
+            self.writer.pop_that(let.index.term.value)
+        else:
+            self.push_var(let.name)
+            self.compile_expression(let.index)
             self.writer.w_add()
-            self.writer.pop_pointer(1)
+            if any(isinstance(node, ArrayRef) for node in let.value.walk()):
+                # the value needs pointer 1 itself, so the address waits on
+                # the stack; temp 0 only holds the value between two pops
+                # and is never live across a call
+                self.compile_expression(let.value)
+                self.writer.pop_temp(0)
+                self.writer.pop_pointer(1)
+                self.writer.push_temp(0)
+            else:
+                self.writer.pop_pointer(1)
+                self.that_base = None
+                self.compile_expression(let.value)
+            self.that_base = None
             self.writer.pop_that(0)
+
+    def strip_not(self, condition: Expression) -> Tuple[Node, bool]:
+        # `~c` is compiled as c with the branch reversed rather than with a
+        # not; returns c and whether it was negated
+        negated = False
+        node = condition
+        while True:
+            if isinstance(node, Expression) and not node.ops:
+                node = node.term
+            elif isinstance(node, Group):
+                node = node.expression
+            elif isinstance(node, Unary) and node.op == '~':
+                node = node.term
+                negated = not negated
+            else:
+                return node, negated
+
+    def is_boolean(self, node: Node) -> bool:
+        # whether node can only be true (-1) or false (0); only then does
+        # `if-goto` branch exactly when `not, if-goto` would not
+        if isinstance(node, Expression):
+            boolean = self.is_boolean(node.term)
+            for op, term in node.ops:
+                if op in ['<', '>', '=']:
+                    boolean = True
+                else:
+                    boolean = op in ['&', '|'] and boolean and self.is_boolean(term)
+            return boolean
+        elif isinstance(node, Group):
+            return self.is_boolean(node.expression)
+        elif isinstance(node, Unary):
+            return node.op == '~' and self.is_boolean(node.term)
+        elif isinstance(node, KeywordConstant):
+            return node.keyword in [KeywordEnum.TRUE, KeywordEnum.FALSE]
+        return False
+
+    def compile_condition(self, condition: Node) -> None:
+        if isinstance(condition, Expression):
+            self.compile_expression(condition)
         else:
-            self.pop_var(name)
-        
-        self.discard_if(';')
+            self.compile_term(condition)
 
-    def compile_if(self) -> None:
+    def compile_if(self, statement: If) -> None:
         label_id = self.get_label_id()
+        condition, negated = self.strip_not(statement.condition)
+        self.compile_condition(condition)
+
+        # the block falling through after the if-goto, and the one it jumps to
+        fallen, taken = statement.then, statement.otherwise or []
+        label = '_ELSE_{}'.format(label_id)
+        if negated:
+            # the if-goto already branches when `~c` is false
+            pass
+        elif statement.otherwise is not None and self.is_boolean(condition):
+            fallen, taken = taken, fallen
+            label = '_IF_TRUE_{}'.format(label_id)
+        else:
+            self.writer.w_not()
 
-        self.discard_if(KeywordEnum.IF)
-        
-        self.compile_expression()
-        self.writer.w_not()
-        self.writer.w_if('_ELSE_{}'.format(label_id))
-
-        self.discard_if('{')
-        self.compile_statements()
-        self.discard_if('}')
-
-        self.writer.w_goto('_ENDIF_{}'.format(label_id))
-        self.writer.w_label('_ELSE_{}'.format(label_id))
-
-        if self.current_is(KeywordEnum.ELSE):
-            self.next()
-            self.discard_if('{')
-            self.compile_statements()
-            self.discard_if('}')
+        if not taken:
+            self.writer.w_if('_ENDIF_{}'.format(label_id))
+            self.compile_statements(fallen)
+        else:
+            self.writer.w_if(label)
+            self.compile_statements(fallen)
+            self.writer.w_goto('_ENDIF_{}'.format(label_id))
+            self.writer.w_label(label)
+            self.that_base = None
+            self.compile_statements(taken)
 
         self.writer.w_label('_ENDIF_{}'.format(label_id))
-            
-    def compile_while(self) -> None:
+        self.that_base = None
+
+    def compile_while(self, statement: While) -> None:
         label_id = self.get_label_id()
-    
-        self.discard_if(KeywordEnum.WHILE)
+
+        if self.is_boolean(statement.condition):
+            # tested at the bottom, so an iteration is the body, the
+            # condition and a single if-goto
+            self.writer.w_goto('_WHILE_TEST_{}'.format(label_id))
+            self.writer.w_label('_WHILE_{}'.format(label_id))
+            self.that_base = None
+            self.compile_statements(statement.body)
+
+            self.writer.w_label('_WHILE_TEST_{}'.format(label_id))
+            self.that_base = None
+            self.line = self.writer.line = statement.condition.line
+            self.compile_expression(statement.condition)
+            self.writer.w_if('_WHILE_{}'.format(label_id))
+            self.that_base = None
+            return
 
         self.writer.w_label('_WHILE_{}'.format(label_id))
-        self.compile_expression()
-        self.writer.w_not()
+        self.that_base = None
+        condition, negated = self.strip_not(statement.condition)
+        self.compile_condition(condition)
+        if not negated:
+            self.writer.w_not()
         self.writer.w_if('_WHILE_END_{}'.format(label_id))
-        
-        self.discard_if('{')
-        if not self.current_is('}'):
-            self.compile_statements()
-        self.discard_if('}')
+
+        self.compile_statements(statement.body)
 
         self.writer.w_goto('_WHILE_{}'.format(label_id))
         self.writer.w_label('_WHILE_END_{}'.format(label_id))
+        self.that_base = None
 
-    def compile_do(self) -> None:
-        self.discard_if(KeywordEnum.DO)
-        self.compile_subroutine_call()
+    def compile_do(self, statement: Do) -> None:
+        self.compile_subroutine_call(statement.call)
         self.writer.pop_temp(0)
-        self.discard_if(';')
 
-    def compile_return(self) -> None:
-        self.discard_if(KeywordEnum.RETURN)
-        if self.current_is(self.TERM):
-            self.compile_expression()
+    def compile_return(self, statement: Return) -> None:
+        if statement.value:
+            self.compile_expression(statement.value)
         else:
             self.writer.push_const(0)
-        self.discard_if(';')
         self.writer.w_return()
 
-    def compile_subroutine_call(self, last: Optional[Token] = None) -> None:
-        # because we need to look t+2 ahead when doing expression, we might
-        # have to pass in the identifier manually
-        owner_name = last.token if last else self.discard_if(TokenEnum.IDENTIFIER).token
-        class_name = owner_name
+    def compile_subroutine_call(self, call: SubroutineCall) -> None:
         args = 0
 
-        if self.current_is('.'):
-            self.next()
-            routine_name = self.discard_if(TokenEnum.IDENTIFIER).token
-            ref = self.symbol_table.find(owner_name)
+        if call.owner:
+            class_name = call.owner
+            ref = self.symbol_table.find(call.owner)
             if ref:
                 class_name = ref.tpe
-                self.push_var(owner_name)
+                self.push_var(call.owner)
                 args += 1
         else:
-            routine_name = owner_name
             class_name = self.class_name
             self.writer.push_pointer(0)
             args += 1
 
-        call = '{}.{}'.format(class_name, routine_name)
-
-        self.discard_if('(')
-        args += self.compile_expression_list()
-        self.discard_if(')')
-
-        self.writer.w_call(call, args)
-
-    def compile_expression_list(self) -> None:
-        args = 0
-        
-        if self.current_is(self.TERM):
-            self.compile_expression()
-            args = 1
-        while self.current_is(','):
-            self.discard_if(',')
-            self.compile_expression()
-            args += 1
-
-        return args
-
-    def compile_expression(self) -> None:
-        self.compile_term()
-        while self.current_is(self.BINARY_OP):
-            op = self.current
-            self.next()
-            self.compile_term()
-            self.compile_op(op.token)
-
-    def compile_term(self) -> None:
-        if self.current_is('('):
-            self.next()
-            self.compile_expression()
-            self.discard_if(')')
-        elif self.current_is(self.UNARY_OP):
-            op = self.current
-            self.next()
-            self.compile_term()
-            self.compile_unary_op(op.token)
-        elif self.current_is(TokenEnum.IDENTIFIER):
-            last = self.current
-            self.next()
-            if self.current_is(self.SUB_CALL):
-                self.compile_subroutine_call(last)
-            elif self.current_is('['):
-                self.push_var(last.token)
-                self.discard_if('[')
-                self.compile_expression()
-                self.discard_if(']')
+        args += self.compile_expression_list(call.args)
+
+        self.call('{}.{}'.format(class_name, call.name), args)
+
+    def compile_expression_list(self, expressions: List[Expression]) -> int:
+        for expression in expressions:
+            self.compile_expression(expression)
+        return len(expressions)
+
+    def compile_expression(self, expression: Expression) -> None:
+        self.compile_term(expression.term)
+        for op, term in expression.ops:
+            self.compile_term(term)
+            self.compile_op(op)
+
+    def compile_term(self, term: Node) -> None:
+        self.line = self.writer.line = term.line
+        if isinstance(term, Group):
+            self.compile_expression(term.expression)
+        elif isinstance(term, Unary):
+            self.compile_term(term.term)
+            self.compile_unary_op(term.op)
+        elif isinstance(term, SubroutineCall):
+            self.compile_subroutine_call(term)
+        elif isinstance(term, ArrayRef):
+            if isinstance(term.index.term, IntConstant) and not term.index.ops:
+                self.set_that(term.name)
+                self.writer.push_that(term.index.term.value)
+            else:
+                self.push_var(term.name)
+                self.compile_expression(term.index)
                 self.writer.w_add()
                 self.writer.pop_pointer(1)
+                self.that_base = None
                 self.writer.push_that(0)
-            else:
-                self.push_var(last.token)
-        elif self.current_is(self.EXPR_CONST):
-            self.compile_const()
+        elif isinstance(term, VarRef):
+            self.push_var(term.name)
+        elif isinstance(term, (IntConstant, StringConstant, KeywordConstant)):
+            self.compile_const(term)
         else:
             raise CompilerError(
-                self.current.line,
-                'Expected expression term, got {}.'.format(self.current)
+                term.line,
+                'Expected expression term, got {}.'.format(term)
             )
 
     def compile_op(self, operation: str) -> None:
         if operation not in self.BINARY_OP:
             raise CompilerError(
-                self.current.line, 
+                self.line,
                 '\'{}\' is not a valid binary operator.'.format(operation)
             )
-        
+
         if operation == '+':
             self.writer.w_add()
         elif operation == '-':
             self.writer.w_sub()
         elif operation == '*':
-            self.writer.w_call('Math.multiply', 2)
+            self.call('Math.multiply', 2)
         elif operation == '/':
-            self.writer.w_call('Math.divide', 2)
+            self.call('Math.divide', 2)
         elif operation == '&':
             self.writer.w_and()
         elif operation == '|':
@@ -436,7 +402,7 @@ class Compiler:
     def compile_unary_op(self, operation: str) -> None:
         if operation not in self.UNARY_OP:
             raise CompilerError(
-                self.current.line, 
+                self.line,
                 '\'{}\' is not a valid unary operator.'.format(operation)
             )
 
@@ -445,23 +411,42 @@ class Compiler:
         else:
             self.writer.w_not()
 
-    def compile_const(self) -> None:
-        const = self.discard_if(self.EXPR_CONST)
-        
-        if const.kind == TokenEnum.INT_CONST:
-            self.writer.push_const(const.token)
-        elif const.kind == TokenEnum.STRING_CONST:
-            self.writer.push_const(len(const.token))
-            self.writer.w_call('String.new', 1)
-            for c in const.token:
-                self.writer.push_const(ord(c))
-                self.writer.w_call('String.appendChar', 2)
-        elif const.kind == TokenEnum.KEYWORD:
-            if const.enum == KeywordEnum.TRUE:
+    def compile_const(self, const: Node) -> None:
+        if isinstance(const, IntConstant):
+            self.writer.push_const(const.value)
+        elif isinstance(const, StringConstant):
+            if self.pool_strings:
+                self.compile_pooled_string(const.value)
+            else:
+                self.compile_string(const.value)
+        elif isinstance(const, KeywordConstant):
+            if const.keyword == KeywordEnum.TRUE:
                 self.writer.push_const(1)
                 self.writer.w_neg()
-            elif const.enum in [KeywordEnum.FALSE, KeywordEnum.NULL]:
+            elif const.keyword in [KeywordEnum.FALSE, KeywordEnum.NULL]:
                 self.writer.push_const(0)
-            elif const.enum == KeywordEnum.THIS:
+            elif const.keyword == KeywordEnum.THIS:
                 self.writer.push_pointer(0)
-        
\ No newline at end of file
+
+    def compile_string(self, value: str) -> None:
+        self.writer.push_const(len(value))
+        self.call('String.new', 1)
+        for c in value:
+            self.writer.push_const(ord(c))
+            self.call('String.appendChar', 2)
+
+    def compile_pooled_string(self, value: str) -> None:
+        if value not in self.string_pool:
+            # '$' can't appear in jack identifiers, so the slot never clashes
+            self.string_pool[value] = self.symbol_table.register(
+                '$string{}'.format(len(self.string_pool)), 'String', IdentEnum.STATIC
+            )
+        index = self.string_pool[value].index
+        label = '_STRING_{}'.format(self.get_label_id())
+
+        self.writer.push_static(index)
+        self.writer.w_if(label)
+        self.compile_string(value)
+        self.writer.pop_static(index)
+        self.writer.w_label(label)
+        self.writer.push_static(index)
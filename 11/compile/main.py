@@ -2,9 +2,15 @@ from pathlib import Path
 
 from compile.tokenizer import Tokenizer
 from compile.compiler import Compiler, CompilerError
+from compile.xml_writer import XMLWriter
 
 
-def compile(path: Path) -> None:
+def compile(
+    path: Path,
+    xml: bool = False,
+    pool_strings: bool = False,
+    source_map: bool = False
+) -> None:
     files = []
     if path.is_dir():
         files = path.glob('*.jack')
@@ -15,10 +21,10 @@ def compile(path: Path) -> None:
             files = [path]
         else:
             raise ValueError('Not a .jack file.')
-        
+
     for file in files:
         try:
-            compile_file(file)
+            compile_file(file, xml, pool_strings, source_map)
         except CompilerError as e:
             print('Error in {}:'.format(file))
             print('    {}'.format(e))
@@ -26,12 +32,25 @@ def compile(path: Path) -> None:
             return
     print('\033[92mCompilation done.')
 
-def compile_file(path: Path):
+def compile_file(
+    path: Path,
+    xml: bool = False,
+    pool_strings: bool = False,
+    source_map: bool = False
+):
     out_path = path.parent / path.parts[-1].replace('.jack', '.vm')
-    tokenizer = Tokenizer(path)
-    compiler = Compiler(tokenizer).write_to(out_path)
+    compiler = Compiler(Tokenizer(path), pool_strings)
+    tree = compiler.parse()
+    if xml:
+        XMLWriter().write_to(path.parent / path.parts[-1].replace('.jack', '_my.xml'), tree)
+    compiler.write_to(out_path, tree, source_map)
 
 
 if __name__ == '__main__':
     import sys
-    compile(Path(sys.argv[1]))
+    compile(
+        Path(sys.argv[1]),
+        xml='--xml' in sys.argv[2:],
+        pool_strings='--pool-strings' in sys.argv[2:],
+        source_map='--map' in sys.argv[2:]
+    )
@@ -0,0 +1,241 @@
+from typing import Any, Iterator, List, Optional, Tuple
+
+from compile.syntax import KeywordEnum
+
+
+class Node:
+    __slots__ = ('line',)
+
+    def __init__(self, line: int) -> None:
+        self.line = line
+
+    def __repr__(self) -> str:
+        return '{}({})'.format(
+            self.__class__.__name__,
+            ', '.join(repr(getattr(self, s)) for s in self.__slots__)
+        )
+
+    def children(self) -> Iterator['Node']:
+        for slot in self.__slots__:
+            yield from _nodes_in(getattr(self, slot))
+
+    def walk(self) -> Iterator['Node']:
+        yield self
+        for child in self.children():
+            yield from child.walk()
+
+
+def _nodes_in(value: Any) -> Iterator[Node]:
+    if isinstance(value, Node):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _nodes_in(item)
+
+
+# terms
+
+class IntConstant(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, line: int, value: int) -> None:
+        super().__init__(line)
+        self.value = value
+
+
+class StringConstant(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, line: int, value: str) -> None:
+        super().__init__(line)
+        self.value = value
+
+
+class KeywordConstant(Node):
+    __slots__ = ('keyword',)
+
+    def __init__(self, line: int, keyword: KeywordEnum) -> None:
+        super().__init__(line)
+        self.keyword = keyword
+
+
+class VarRef(Node):
+    __slots__ = ('name',)
+
+    def __init__(self, line: int, name: str) -> None:
+        super().__init__(line)
+        self.name = name
+
+
+class ArrayRef(Node):
+    __slots__ = ('name', 'index')
+
+    def __init__(self, line: int, name: str, index: 'Expression') -> None:
+        super().__init__(line)
+        self.name = name
+        self.index = index
+
+
+class SubroutineCall(Node):
+    # owner is None for unqualified calls (`foo()`), otherwise the class or
+    # variable name in front of the dot
+    __slots__ = ('owner', 'name', 'args')
+
+    def __init__(
+        self,
+        line: int,
+        owner: Optional[str],
+        name: str,
+        args: List['Expression']
+    ) -> None:
+        super().__init__(line)
+        self.owner = owner
+        self.name = name
+        self.args = args
+
+
+class Group(Node):
+    __slots__ = ('expression',)
+
+    def __init__(self, line: int, expression: 'Expression') -> None:
+        super().__init__(line)
+        self.expression = expression
+
+
+class Unary(Node):
+    __slots__ = ('op', 'term')
+
+    def __init__(self, line: int, op: str, term: Node) -> None:
+        super().__init__(line)
+        self.op = op
+        self.term = term
+
+
+class Expression(Node):
+    # jack has no operator precedence, so an expression is kept as a flat
+    # `term (op term)*` chain evaluated left to right
+    __slots__ = ('term', 'ops')
+
+    def __init__(self, line: int, term: Node, ops: List[Tuple[str, Node]]) -> None:
+        super().__init__(line)
+        self.term = term
+        self.ops = ops
+
+
+# statements
+
+class Let(Node):
+    __slots__ = ('name', 'index', 'value')
+
+    def __init__(
+        self,
+        line: int,
+        name: str,
+        index: Optional[Expression],
+        value: Expression
+    ) -> None:
+        super().__init__(line)
+        self.name = name
+        self.index = index
+        self.value = value
+
+
+class If(Node):
+    __slots__ = ('condition', 'then', 'otherwise')
+
+    def __init__(
+        self,
+        line: int,
+        condition: Expression,
+        then: List[Node],
+        otherwise: Optional[List[Node]]
+    ) -> None:
+        super().__init__(line)
+        self.condition = condition
+        self.then = then
+        self.otherwise = otherwise
+
+
+class While(Node):
+    __slots__ = ('condition', 'body')
+
+    def __init__(self, line: int, condition: Expression, body: List[Node]) -> None:
+        super().__init__(line)
+        self.condition = condition
+        self.body = body
+
+
+class Do(Node):
+    __slots__ = ('call',)
+
+    def __init__(self, line: int, call: SubroutineCall) -> None:
+        super().__init__(line)
+        self.call = call
+
+
+class Return(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, line: int, value: Optional[Expression]) -> None:
+        super().__init__(line)
+        self.value = value
+
+
+# declarations
+
+class VarDec(Node):
+    # kind is STATIC or FIELD for class level declarations, VAR for locals
+    __slots__ = ('kind', 'tpe', 'names')
+
+    def __init__(self, line: int, kind: KeywordEnum, tpe: str, names: List[str]) -> None:
+        super().__init__(line)
+        self.kind = kind
+        self.tpe = tpe
+        self.names = names
+
+
+class Parameter(Node):
+    __slots__ = ('tpe', 'name')
+
+    def __init__(self, line: int, tpe: str, name: str) -> None:
+        super().__init__(line)
+        self.tpe = tpe
+        self.name = name
+
+
+class Subroutine(Node):
+    __slots__ = ('kind', 'ret_type', 'name', 'params', 'var_decs', 'statements')
+
+    def __init__(
+        self,
+        line: int,
+        kind: KeywordEnum,
+        ret_type: str,
+        name: str,
+        params: List[Parameter],
+        var_decs: List[VarDec],
+        statements: List[Node]
+    ) -> None:
+        super().__init__(line)
+        self.kind = kind
+        self.ret_type = ret_type
+        self.name = name
+        self.params = params
+        self.var_decs = var_decs
+        self.statements = statements
+
+
+class Class(Node):
+    __slots__ = ('name', 'var_decs', 'subroutines')
+
+    def __init__(
+        self,
+        line: int,
+        name: str,
+        var_decs: List[VarDec],
+        subroutines: List[Subroutine]
+    ) -> None:
+        super().__init__(line)
+        self.name = name
+        self.var_decs = var_decs
+        self.subroutines = subroutines
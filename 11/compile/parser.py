@@ -0,0 +1,305 @@
+from typing import List, Union, Set, Optional
+
+from enum import Enum
+
+from compile.tokenizer import Tokenizer
+from compile.token import *
+from compile.syntax import *
+from compile.nodes import *
+
+
+class CompilerError(Exception):
+    def __init__(self, line: int, message: str) -> None:
+        super().__init__('Line {}: {}'.format(line, message))
+
+
+class Parser:
+    CLASS_VAR_DEC = {KeywordEnum.STATIC, KeywordEnum.FIELD}
+    SUBROUTINE_DEC = {KeywordEnum.CONSTRUCTOR, KeywordEnum.FUNCTION, KeywordEnum.METHOD}
+    VAR_TYPES = {KeywordEnum.INT, KeywordEnum.CHAR, KeywordEnum.BOOLEAN, TokenEnum.IDENTIFIER}
+    FUNCTION_TYPES = {KeywordEnum.VOID} | VAR_TYPES
+    STATEMENTS = {KeywordEnum.LET, KeywordEnum.IF, KeywordEnum.WHILE, KeywordEnum.DO, KeywordEnum.RETURN}
+    TERM_OPEN = set('(')
+    UNARY_OP = set('-~')
+    BINARY_OP = set('+-*/&|<>=')
+    EXPR_CONST = {KeywordEnum.TRUE, KeywordEnum.FALSE, KeywordEnum.NULL, KeywordEnum.THIS, TokenEnum.INT_CONST, TokenEnum.STRING_CONST}
+    TERM = {TokenEnum.IDENTIFIER} | UNARY_OP | TERM_OPEN | EXPR_CONST
+    SUB_CALL = set('(.')
+
+    def __init__(self, tokenizer: Tokenizer) -> None:
+        self.tokenizer = tokenizer
+
+    def parse(self) -> Class:
+        self.tokens = iter(self.tokenizer)
+        self.next() # pre-load first token
+        return self.parse_class()
+
+    def next(self) -> None:
+        try:
+            self.current = next(self.tokens)
+        except StopIteration:
+            raise CompilerError(self.current.line, 'Unexpected EOF.')
+
+    def current_is(self, options: Union[
+        TokenEnum, KeywordEnum, str,
+        Set[Union[TokenEnum, KeywordEnum, str]]
+    ]) -> bool:
+        if not isinstance(options, set):
+            options = {options}
+        if self.current.kind in options:
+            return True
+        elif self.current.kind == TokenEnum.KEYWORD:
+            return self.current.enum in options
+        elif self.current.kind == TokenEnum.SYMBOL:
+            return self.current.token in options
+
+    def discard_if(self, options: Union[
+        TokenEnum, KeywordEnum, str,
+        Set[Union[TokenEnum, KeywordEnum, str]]
+    ]) -> Token:
+        if self.current_is(options):
+            token = self.current
+            self.next()
+            return token
+        else:
+            if not isinstance(options, set):
+                options = {options}
+            self.raise_unexpected([o.name if isinstance(o, Enum) else o for o in options])
+
+    def raise_unexpected(self, expected: Set[str]) -> None:
+        raise CompilerError(self.current.line, 'Expected {}, got {} instead.'.format(
+            '|'.join(expected),
+            self.current.token
+        ))
+
+    def parse_class(self) -> Class:
+        line = self.discard_if(KeywordEnum.CLASS).line
+        name = self.discard_if(TokenEnum.IDENTIFIER).token
+        self.discard_if('{')
+
+        var_decs = []
+        subroutines = []
+        while not self.current_is(self.SUBROUTINE_DEC | {'}'}):
+            var_decs.append(self.parse_class_var_dec())
+        while not self.current_is('}'):
+            subroutines.append(self.parse_subroutine_dec())
+
+        # can't iterate, will raise stop iteration
+        if not self.current_is('}'):
+            raise CompilerError(self.current.line, 'Unexpected EOF.')
+
+        return Class(line, name, var_decs, subroutines)
+
+    def parse_type(self, function: bool = False) -> str:
+        types = self.FUNCTION_TYPES if function else self.VAR_TYPES
+        return self.discard_if(types).token
+
+    def parse_class_var_dec(self) -> VarDec:
+        kind = self.discard_if(self.CLASS_VAR_DEC)
+        return self.parse_var_list(kind)
+
+    def parse_var_list(self, kind: Keyword) -> VarDec:
+        tpe = self.parse_type()
+
+        names = [self.discard_if(TokenEnum.IDENTIFIER).token]
+        while not self.current_is(';'):
+            self.discard_if(',')
+            names.append(self.discard_if(TokenEnum.IDENTIFIER).token)
+
+        self.discard_if(';')
+        return VarDec(kind.line, kind.enum, tpe, names)
+
+    def parse_subroutine_dec(self) -> Subroutine:
+        kind = self.discard_if(self.SUBROUTINE_DEC)
+        ret_type = self.parse_type(True)
+        name = self.discard_if(TokenEnum.IDENTIFIER).token
+
+        params = self.parse_parameter_list()
+        self.discard_if('{')
+
+        var_decs = []
+        while not self.current_is({'}'} | self.STATEMENTS):
+            var_decs.append(self.parse_var_list(self.discard_if(KeywordEnum.VAR)))
+
+        statements = self.parse_statements()
+        self.discard_if('}')
+
+        return Subroutine(kind.line, kind.enum, ret_type, name, params, var_decs, statements)
+
+    def parse_parameter_list(self) -> List[Parameter]:
+        self.discard_if('(')
+
+        params = []
+        while not self.current_is(')'):
+            if params:
+                self.discard_if(',')
+            line = self.current.line
+            tpe = self.parse_type()
+            name = self.discard_if(TokenEnum.IDENTIFIER).token
+            params.append(Parameter(line, tpe, name))
+
+        self.discard_if(')')
+        return params
+
+    def parse_statements(self) -> List[Node]:
+        statements = []
+        while self.current_is(self.STATEMENTS):
+            statements.append(self.parse_statement())
+        return statements
+
+    def parse_block(self) -> List[Node]:
+        self.discard_if('{')
+        statements = self.parse_statements()
+        self.discard_if('}')
+        return statements
+
+    def parse_statement(self) -> Node:
+        if self.current_is(KeywordEnum.LET):
+            return self.parse_let()
+        elif self.current_is(KeywordEnum.IF):
+            return self.parse_if()
+        elif self.current_is(KeywordEnum.WHILE):
+            return self.parse_while()
+        elif self.current_is(KeywordEnum.DO):
+            return self.parse_do()
+        elif self.current_is(KeywordEnum.RETURN):
+            return self.parse_return()
+        else:
+            raise CompilerError(
+                self.current.line,
+                'Expected let|if|while|do|return, got {} instead.'.format(self.current)
+            )
+
+    def parse_let(self) -> Let:
+        line = self.discard_if(KeywordEnum.LET).line
+        name = self.discard_if(TokenEnum.IDENTIFIER).token
+        index = None
+
+        if self.current_is('['):
+            self.discard_if('[')
+            index = self.parse_expression()
+            self.discard_if(']')
+
+        self.discard_if('=')
+        value = self.parse_expression()
+        self.discard_if(';')
+
+        return Let(line, name, index, value)
+
+    def parse_if(self) -> If:
+        line = self.discard_if(KeywordEnum.IF).line
+        condition = self.parse_condition()
+        then = self.parse_block()
+        otherwise = None
+
+        if self.current_is(KeywordEnum.ELSE):
+            self.next()
+            otherwise = self.parse_block()
+
+        return If(line, condition, then, otherwise)
+
+    def parse_condition(self) -> Expression:
+        self.discard_if('(')
+        condition = self.parse_expression()
+        self.discard_if(')')
+        return condition
+
+    def parse_while(self) -> While:
+        line = self.discard_if(KeywordEnum.WHILE).line
+        condition = self.parse_condition()
+        body = self.parse_block()
+        return While(line, condition, body)
+
+    def parse_do(self) -> Do:
+        line = self.discard_if(KeywordEnum.DO).line
+        call = self.parse_subroutine_call()
+        self.discard_if(';')
+        return Do(line, call)
+
+    def parse_return(self) -> Return:
+        line = self.discard_if(KeywordEnum.RETURN).line
+        value = None
+        if self.current_is(self.TERM):
+            value = self.parse_expression()
+        self.discard_if(';')
+        return Return(line, value)
+
+    def parse_subroutine_call(self, last: Optional[Token] = None) -> SubroutineCall:
+        # because we need to look t+2 ahead when doing expression, we might
+        # have to pass in the identifier manually
+        first = last if last else self.discard_if(TokenEnum.IDENTIFIER)
+        owner = None
+        name = first.token
+
+        if self.current_is('.'):
+            self.next()
+            owner = name
+            name = self.discard_if(TokenEnum.IDENTIFIER).token
+
+        self.discard_if('(')
+        args = self.parse_expression_list()
+        self.discard_if(')')
+
+        return SubroutineCall(first.line, owner, name, args)
+
+    def parse_expression_list(self) -> List[Expression]:
+        args = []
+
+        if self.current_is(self.TERM):
+            args.append(self.parse_expression())
+        while self.current_is(','):
+            self.discard_if(',')
+            args.append(self.parse_expression())
+
+        return args
+
+    def parse_expression(self) -> Expression:
+        line = self.current.line
+        term = self.parse_term()
+        ops = []
+        while self.current_is(self.BINARY_OP):
+            op = self.current.token
+            self.next()
+            ops.append((op, self.parse_term()))
+        return Expression(line, term, ops)
+
+    def parse_term(self) -> Node:
+        line = self.current.line
+        if self.current_is('('):
+            self.next()
+            expression = self.parse_expression()
+            self.discard_if(')')
+            return Group(line, expression)
+        elif self.current_is(self.UNARY_OP):
+            op = self.current.token
+            self.next()
+            return Unary(line, op, self.parse_term())
+        elif self.current_is(TokenEnum.IDENTIFIER):
+            last = self.current
+            self.next()
+            if self.current_is(self.SUB_CALL):
+                return self.parse_subroutine_call(last)
+            elif self.current_is('['):
+                self.discard_if('[')
+                index = self.parse_expression()
+                self.discard_if(']')
+                return ArrayRef(line, last.token, index)
+            else:
+                return VarRef(line, last.token)
+        elif self.current_is(self.EXPR_CONST):
+            return self.parse_const()
+        else:
+            raise CompilerError(
+                self.current.line,
+                'Expected expression term, got {}.'.format(self.current)
+            )
+
+    def parse_const(self) -> Node:
+        const = self.discard_if(self.EXPR_CONST)
+
+        if const.kind == TokenEnum.INT_CONST:
+            return IntConstant(const.line, int(const.token))
+        elif const.kind == TokenEnum.STRING_CONST:
+            return StringConstant(const.line, const.token)
+        else:
+            return KeywordConstant(const.line, const.enum)
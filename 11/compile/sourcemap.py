@@ -0,0 +1,166 @@
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# maps output positions (0-based lines, or rom addresses for .hack) to a
+# (source file, line, name) each. a stage's source lines are the previous
+# stage's output positions, so the maps of a build chain together:
+# Prog.hack.map -> Prog.asm.map -> Main.vm.map -> Main.jack
+MAGIC = b'HSM1'
+
+
+def write_vlq(out: bytearray, value: int) -> None:
+    # zigzag, then 7 bits per byte, low bits first
+    value = value << 1 if value >= 0 else (-value << 1) - 1
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_vlq(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            break
+    return (-((value + 1) >> 1) if value & 1 else value >> 1), pos
+
+
+class SourceMap:
+    def __init__(self) -> None:
+        self.sources = []
+        self.names = []
+        self._ids = ({}, {})
+        self.outputs = []
+        # (source id, line, name id) for each output in self.outputs
+        self.targets = []
+
+    def _intern(self, table: List[str], ids: Dict[str, int], value: str) -> int:
+        if value not in ids:
+            ids[value] = len(table)
+            table.append(value)
+        return ids[value]
+
+    def add(self, output: int, source: str, line: int, name: str = '') -> None:
+        # outputs must be added in order; each entry holds until the next one
+        target = (
+            self._intern(self.sources, self._ids[0], source),
+            line,
+            self._intern(self.names, self._ids[1], name)
+        )
+        if self.targets and self.targets[-1] == target:
+            return
+        if self.outputs and self.outputs[-1] == output:
+            self.targets[-1] = target
+            return
+        self.outputs.append(output)
+        self.targets.append(target)
+
+    def __iter__(self) -> Iterator[Tuple[int, str, int, str]]:
+        for output, (source, line, name) in zip(self.outputs, self.targets):
+            yield (output, self.sources[source], line, self.names[name])
+
+    def __len__(self) -> int:
+        return len(self.outputs)
+
+    def lookup(self, output: int) -> Optional[Tuple[str, int, str]]:
+        i = bisect_right(self.outputs, output) - 1
+        if i < 0:
+            return None
+        source, line, name = self.targets[i]
+        return (self.sources[source], line, self.names[name])
+
+    def compose(self, inner: Dict[str, 'SourceMap']) -> 'SourceMap':
+        # follows each entry into the map of its source file, if there is one
+        composed = SourceMap()
+        for output, source, line, name in self:
+            target = inner[source].lookup(line) if source in inner else None
+            if target:
+                composed.add(output, target[0], target[1], target[2] or name)
+            else:
+                composed.add(output, source, line, name)
+        return composed
+
+    def to_bytes(self) -> bytes:
+        out = bytearray(MAGIC)
+        for table in (self.sources, self.names):
+            write_vlq(out, len(table))
+            for value in table:
+                encoded = value.encode()
+                write_vlq(out, len(encoded))
+                out.extend(encoded)
+
+        # the low bit of the output delta says whether source and name
+        # changed, which they rarely do from one entry to the next
+        write_vlq(out, len(self.outputs))
+        last_output, last_source, last_line, last_name = 0, 0, 0, 0
+        for output, (source, line, name) in zip(self.outputs, self.targets):
+            moved = source != last_source or name != last_name
+            write_vlq(out, (output - last_output) << 1 | moved)
+            write_vlq(out, line - last_line)
+            if moved:
+                write_vlq(out, source - last_source)
+                write_vlq(out, name - last_name)
+            last_output, last_source, last_line, last_name = output, source, line, name
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'SourceMap':
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError('Not a source map.')
+        source_map = cls()
+        pos = len(MAGIC)
+        for table in (source_map.sources, source_map.names):
+            count, pos = read_vlq(data, pos)
+            for i in range(count):
+                length, pos = read_vlq(data, pos)
+                table.append(data[pos:pos + length].decode())
+                pos += length
+        source_map._ids = tuple(
+            dict((value, i) for i, value in enumerate(table))
+            for table in (source_map.sources, source_map.names)
+        )
+
+        count, pos = read_vlq(data, pos)
+        output, source, line, name = 0, 0, 0, 0
+        for i in range(count):
+            delta, pos = read_vlq(data, pos)
+            output += delta >> 1
+            value, pos = read_vlq(data, pos)
+            line += value
+            if delta & 1:
+                value, pos = read_vlq(data, pos)
+                source += value
+                value, pos = read_vlq(data, pos)
+                name += value
+            source_map.outputs.append(output)
+            source_map.targets.append((source, line, name))
+        return source_map
+
+    def write_to(self, path: Path) -> None:
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: Path) -> 'SourceMap':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    @classmethod
+    def load_chain(cls, path: Path, depth: Optional[int] = None) -> 'SourceMap':
+        # the map of a source file sits next to it as <source>.map
+        outer = cls.load(path)
+        if depth == 1:
+            return outer
+        inner = {}
+        for source in outer.sources:
+            inner_path = path.parent / '{}.map'.format(source)
+            if source and inner_path.exists():
+                inner[source] = cls.load_chain(inner_path, depth - 1 if depth else None)
+        return outer.compose(inner)
@@ -1,12 +1,42 @@
 from pathlib import Path
+from typing import Iterator, Tuple
+
+from compile.sourcemap import SourceMap
 
 
 class VMWriter:
-    def __init__(self, out: Path) -> None:
-        self._handle = open(out, 'w')
+    def __init__(self) -> None:
+        self._commands = []
+        # jack line and function each command was generated from
+        self.line = 0
+        self.function = ''
+        self.positions = []
+
+    def __iter__(self) -> Iterator[str]:
+        return (' '.join(map(str, command)) for command in self._commands)
+
+    def commands(self) -> Iterator[Tuple]:
+        # the commands as written, e.g. ('push', 'constant', 1)
+        return iter(self._commands)
+
+    def __len__(self) -> int:
+        return len(self._commands)
 
-    def __del__(self) -> None:
-        self._handle.close()
+    def to_string(self) -> str:
+        return ''.join(line + '\n' for line in self)
+
+    def write_to(self, out: Path) -> None:
+        with open(out, 'w') as f:
+            f.write(self.to_string())
+
+    def source_map(self, source: str) -> SourceMap:
+        source_map = SourceMap()
+        for index, (line, function) in enumerate(self.positions):
+            source_map.add(index, source, line, function)
+        return source_map
+
+    def write_map(self, out: Path, source: str) -> None:
+        self.source_map(source).write_to(out)
 
     def pop_const(self, index: int) -> None:
         self._pop('constant', index)
@@ -84,29 +114,30 @@ class VMWriter:
         self._write('not')
 
     def w_label(self, label: str) -> None:
-        self._write('label ' + label)
+        self._write('label', label)
 
     def w_goto(self, label: str) -> None:
-        self._write('goto ' + label)
+        self._write('goto', label)
 
     def w_if(self, label: str) -> None:
-        self._write('if-goto ' + label)
+        self._write('if-goto', label)
 
     def w_call(self, name: str, args: int) -> None:
-        self._write('call {} {}'.format(name, args))
+        self._write('call', name, args)
 
     def w_function(self, name: str, args: int) -> None:
-        self._write('function {} {}'.format(name, args))
+        self.function = name
+        self._write('function', name, args)
 
     def w_return(self) -> None:
         self._write('return')
 
     def _pop(self, seg: str, index: int) -> None:
-        self._write('pop {} {}'.format(seg, index))
+        self._write('pop', seg, index)
 
     def _push(self, seg: str, index: int) -> None:
-        self._write('push {} {}'.format(seg, index))
-    
-    def _write(self, line: str) -> None:
-        self._handle.write(line + '\n')
-        
\ No newline at end of file
+        self._write('push', seg, index)
+
+    def _write(self, *command) -> None:
+        self._commands.append(command)
+        self.positions.append((self.line, self.function))
@@ -0,0 +1,203 @@
+from typing import List
+from pathlib import Path
+
+from compile.syntax import KEYWORD_CONST_MAP, KeywordEnum
+from compile.nodes import *
+
+
+KEYWORD_NAMES = dict([(v, k) for k, v in KEYWORD_CONST_MAP.items()])
+
+
+class XMLWriter:
+    ESCAPES = {'<': '&lt;', '>': '&gt;', '&': '&amp;', '"': '&quot;'}
+
+    def write_to(self, outf: Path, tree: Class) -> None:
+        self.depth = 0
+        self.lines = []
+        self.write_class(tree)
+        with open(outf, 'w') as f:
+            f.write('\n'.join(self.lines) + '\n')
+
+    def enter_block(self, name: str) -> None:
+        self.write('<{}>'.format(name))
+        self.depth += 1
+
+    def exit_block(self, name: str) -> None:
+        self.depth -= 1
+        self.write('</{}>'.format(name))
+
+    def write(self, line: str) -> None:
+        self.lines.append('  ' * self.depth + line)
+
+    def element(self, tag: str, value: str) -> None:
+        self.write('<{0}> {1} </{0}>'.format(tag, value))
+
+    def keyword(self, keyword: KeywordEnum) -> None:
+        self.element('keyword', KEYWORD_NAMES[keyword])
+
+    def symbol(self, symbol: str) -> None:
+        self.element('symbol', self.ESCAPES.get(symbol, symbol))
+
+    def identifier(self, name: str) -> None:
+        self.element('identifier', name)
+
+    def tpe(self, tpe: str) -> None:
+        if tpe in KEYWORD_CONST_MAP:
+            self.element('keyword', tpe)
+        else:
+            self.identifier(tpe)
+
+    def write_class(self, tree: Class) -> None:
+        self.enter_block('class')
+        self.keyword(KeywordEnum.CLASS)
+        self.identifier(tree.name)
+        self.symbol('{')
+        for var_dec in tree.var_decs:
+            self.write_var_dec(var_dec, 'classVarDec')
+        for subroutine in tree.subroutines:
+            self.write_subroutine_dec(subroutine)
+        self.symbol('}')
+        self.exit_block('class')
+
+    def write_var_dec(self, var_dec: VarDec, block: str) -> None:
+        self.enter_block(block)
+        self.keyword(var_dec.kind)
+        self.tpe(var_dec.tpe)
+        for i, name in enumerate(var_dec.names):
+            if i:
+                self.symbol(',')
+            self.identifier(name)
+        self.symbol(';')
+        self.exit_block(block)
+
+    def write_subroutine_dec(self, subroutine: Subroutine) -> None:
+        self.enter_block('subroutineDec')
+        self.keyword(subroutine.kind)
+        self.tpe(subroutine.ret_type)
+        self.identifier(subroutine.name)
+
+        self.symbol('(')
+        self.enter_block('parameterList')
+        for i, param in enumerate(subroutine.params):
+            if i:
+                self.symbol(',')
+            self.tpe(param.tpe)
+            self.identifier(param.name)
+        self.exit_block('parameterList')
+        self.symbol(')')
+
+        self.enter_block('subroutineBody')
+        self.symbol('{')
+        for var_dec in subroutine.var_decs:
+            self.write_var_dec(var_dec, 'varDec')
+        self.write_statements(subroutine.statements)
+        self.symbol('}')
+        self.exit_block('subroutineBody')
+
+        self.exit_block('subroutineDec')
+
+    def write_block(self, statements: List[Node]) -> None:
+        self.symbol('{')
+        self.write_statements(statements)
+        self.symbol('}')
+
+    def write_statements(self, statements: List[Node]) -> None:
+        self.enter_block('statements')
+        for statement in statements:
+            self.write_statement(statement)
+        self.exit_block('statements')
+
+    def write_statement(self, statement: Node) -> None:
+        if isinstance(statement, Let):
+            self.enter_block('letStatement')
+            self.keyword(KeywordEnum.LET)
+            self.identifier(statement.name)
+            if statement.index:
+                self.symbol('[')
+                self.write_expression(statement.index)
+                self.symbol(']')
+            self.symbol('=')
+            self.write_expression(statement.value)
+            self.symbol(';')
+            self.exit_block('letStatement')
+        elif isinstance(statement, If):
+            self.enter_block('ifStatement')
+            self.keyword(KeywordEnum.IF)
+            self.write_condition(statement.condition)
+            self.write_block(statement.then)
+            if statement.otherwise is not None:
+                self.keyword(KeywordEnum.ELSE)
+                self.write_block(statement.otherwise)
+            self.exit_block('ifStatement')
+        elif isinstance(statement, While):
+            self.enter_block('whileStatement')
+            self.keyword(KeywordEnum.WHILE)
+            self.write_condition(statement.condition)
+            self.write_block(statement.body)
+            self.exit_block('whileStatement')
+        elif isinstance(statement, Do):
+            self.enter_block('doStatement')
+            self.keyword(KeywordEnum.DO)
+            self.write_subroutine_call(statement.call)
+            self.symbol(';')
+            self.exit_block('doStatement')
+        elif isinstance(statement, Return):
+            self.enter_block('returnStatement')
+            self.keyword(KeywordEnum.RETURN)
+            if statement.value:
+                self.write_expression(statement.value)
+            self.symbol(';')
+            self.exit_block('returnStatement')
+
+    def write_condition(self, condition: Expression) -> None:
+        self.symbol('(')
+        self.write_expression(condition)
+        self.symbol(')')
+
+    def write_subroutine_call(self, call: SubroutineCall) -> None:
+        if call.owner:
+            self.identifier(call.owner)
+            self.symbol('.')
+        self.identifier(call.name)
+        self.symbol('(')
+        self.enter_block('expressionList')
+        for i, arg in enumerate(call.args):
+            if i:
+                self.symbol(',')
+            self.write_expression(arg)
+        self.exit_block('expressionList')
+        self.symbol(')')
+
+    def write_expression(self, expression: Expression) -> None:
+        self.enter_block('expression')
+        self.write_term(expression.term)
+        for op, term in expression.ops:
+            self.symbol(op)
+            self.write_term(term)
+        self.exit_block('expression')
+
+    def write_term(self, term: Node) -> None:
+        self.enter_block('term')
+        if isinstance(term, Group):
+            self.symbol('(')
+            self.write_expression(term.expression)
+            self.symbol(')')
+        elif isinstance(term, Unary):
+            self.symbol(term.op)
+            self.write_term(term.term)
+        elif isinstance(term, SubroutineCall):
+            self.write_subroutine_call(term)
+        elif isinstance(term, ArrayRef):
+            self.identifier(term.name)
+            self.symbol('[')
+            self.write_expression(term.index)
+            self.symbol(']')
+        elif isinstance(term, VarRef):
+            self.identifier(term.name)
+        elif isinstance(term, IntConstant):
+            self.element('integerConstant', str(term.value))
+        elif isinstance(term, StringConstant):
+            self.element('stringConstant', term.value)
+        elif isinstance(term, KeywordConstant):
+            self.keyword(term.keyword)
+        self.exit_block('term')
@@ -0,0 +1,4 @@
+#!/bin/bash
+SCRIPTPATH="$( cd "$(dirname "$0")" ; pwd -P )"
+FILEPATH="$(cd "$(dirname "$1")"; pwd)/$(basename "$1")"
+(cd $SCRIPTPATH/.. && PYTHONPATH=../06:../08:../11:. python3 toolchain/main.py $FILEPATH "${@:2}")
@@ -0,0 +1,108 @@
+import time
+from pathlib import Path
+from typing import List
+
+from compile.compiler import CompilerError
+from emulator.machine import Machine
+from toolchain.pipeline import Build, Pipeline
+from toolchain.native import NativeOS, function_addresses
+
+
+def build(
+    path: Path,
+    keep: bool = False,
+    pool_strings: bool = False,
+    source_map: bool = False,
+    cycles: int = 0,
+    compiled: str = '',
+    screen: str = '',
+    cache_top: bool = False,
+    light_frames: bool = False,
+    tail_calls: bool = False,
+    stack_slots: bool = False,
+    loop_locals: int = 0
+) -> None:
+    out_dir = path if path.is_dir() else path.parent
+    try:
+        result = Pipeline(
+            path, pool_strings, source_map,
+            stub_os=bool(cycles), cache_top=cache_top, light_frames=light_frames,
+            tail_calls=tail_calls, stack_slots=stack_slots, loop_locals=loop_locals
+        ).run()
+    except CompilerError as e:
+        print('    {}'.format(e))
+        print('\033[91mBuild failed.')
+        return
+
+    if keep:
+        vm = result.vm
+        for name in result.jack:
+            with open(out_dir / '{}.vm'.format(name), 'w') as f:
+                f.write(''.join(line + '\n' for line in vm[name]))
+        with open(out_dir / '{}.asm'.format(result.name), 'w') as f:
+            f.write(''.join(line + '\n' for line in result.asm))
+    with open(out_dir / '{}.hack'.format(result.name), 'w') as f:
+        f.write(''.join(word + '\n' for word in result.hack))
+    for name, source_map in result.maps.items():
+        source_map.write_to(out_dir / '{}.map'.format(name))
+
+    for stage in Pipeline.STAGES:
+        print('{:>10}: {:8.1f} ms'.format(stage, result.timings[stage] * 1000))
+    print('{:>10}: {} words'.format('rom', len(result.hack)))
+    print('\033[92mBuild done.\033[0m')
+
+    if cycles:
+        run(result, cycles, [c for c in compiled.split(',') if c], screen)
+
+
+def run(build: Build, cycles: int, compiled: List[str], screen: str = '') -> None:
+    machine = Machine([int(word, 2) for word in build.hack])
+    try:
+        native = NativeOS(
+            machine, function_addresses(build.asm), compiled, build.functions
+        )
+    except ValueError as e:
+        print('    {}'.format(e))
+        print('\033[91mRun failed.')
+        return
+
+    start = time.perf_counter()
+    machine.run(cycles)
+    elapsed = time.perf_counter() - start
+
+    print('{} cycles in {:.1f} ms, {}, {} os functions native'.format(
+        machine.cycles, elapsed * 1000,
+        'halted' if machine.halted else 'running', len(native.trapped)
+    ))
+    if native.os.output:
+        print(''.join(native.os.output))
+    if screen:
+        from emulator.framebuffer import Framebuffer
+        framebuffer = Framebuffer(machine.ram)
+        framebuffer.update()
+        framebuffer.write_to(Path(screen))
+
+
+if __name__ == '__main__':
+    import sys
+    args = sys.argv[2:]
+
+    def option(name: str, default: str) -> str:
+        return args[args.index(name) + 1] if name in args else default
+
+    build(
+        Path(sys.argv[1]),
+        keep='--keep' in args,
+        pool_strings='--pool-strings' in args,
+        source_map='--map' in args,
+        cycles=int(option('--run', '0')),
+        compiled=option('--jack', ''),
+        screen=option('--screen', ''),
+        # stack slots only apply with the top cached. they take up to 8 of
+        # the 240 static words, right after the statics.
+        cache_top='--cache-top' in args or '--stack-slots' in args,
+        light_frames='--light-frames' in args,
+        tail_calls='--tail-calls' in args,
+        stack_slots='--stack-slots' in args,
+        loop_locals=int(option('--loop-locals', '0'))
+    )
@@ -0,0 +1,104 @@
+from typing import Callable, Collection, Dict, List, Optional, Set
+
+from assembler.main import create_table
+from assembler.parser import LineParser
+from emulator.machine import Machine
+from interpreter.jackos import JackOS, conflicts
+
+
+SP, LCL, ARG, THIS, THAT = 0, 1, 2, 3, 4
+
+
+def function_addresses(asm: List[str]) -> Dict[str, int]:
+    return create_table(LineParser(asm)).table
+
+
+def functions(vm: Dict[str, List[str]]) -> Set[str]:
+    return {
+        parts[1]
+        for lines in vm.values()
+        for parts in (line.split() for line in lines)
+        if parts and parts[0] == 'function'
+    }
+
+
+def os_stubs(vm: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    # entry points for the os functions a program calls but does not
+    # define, so there is an address to trap
+    natives = JackOS([]).natives()
+    defined = functions(vm)
+    called = set()
+    for lines in vm.values():
+        for line in lines:
+            parts = line.split()
+            if parts and parts[0] == 'call':
+                called.add(parts[1])
+
+    stubs = {}
+    if 'Sys.init' not in defined:
+        stubs['Sys'] = [
+            'function Sys.init 0', 'call Main.main 0', 'call Sys.halt 0', 'return'
+        ]
+        called.add('Sys.halt')
+    for name in sorted(called - defined):
+        if name in natives:
+            stubs.setdefault(name.split('.')[0], []).extend([
+                'function {} 0'.format(name), 'push constant 0', 'return'
+            ])
+    return stubs
+
+
+class NativeOS:
+    # runs the os functions of a translated program in python: the entry of
+    # each one is trapped once the caller has built its frame, and the trap
+    # does the function's work and its return in a single step. classes in
+    # compiled ('all' for every class) keep running their jack code where
+    # the program defines it; os_stubs entries are not in defined and
+    # stay trapped. a compiled String or Memory can't be mixed with natives
+    # that use its objects directly.
+    def __init__(
+        self,
+        machine: Machine,
+        addresses: Dict[str, int],
+        compiled: Collection[str] = (),
+        defined: Collection[str] = ()
+    ) -> None:
+        self.os = JackOS(machine.ram)
+        self.trapped = []
+        kept = set()
+        for name, native in self.os.natives().items():
+            keep = 'all' in compiled or name.split('.')[0] in compiled
+            if keep and name in defined:
+                kept.add(name.split('.')[0])
+                continue
+            if name in addresses:
+                self.trapped.append(name)
+
+        clashes = conflicts(kept, self.trapped)
+        if clashes:
+            raise ValueError(
+                'Cannot mix compiled and native os: {}; list their classes in --jack too.'
+                .format(', '.join(clashes))
+            )
+        natives = self.os.natives()
+        for name in self.trapped:
+            machine.trap(addresses[name], self.handler(natives[name]))
+
+    def handler(self, native: Callable[..., int]) -> Callable[[List[int]], Optional[int]]:
+        os = self.os
+
+        def call(ram: List[int]) -> Optional[int]:
+            frame, arg = ram[LCL], ram[ARG]
+            # with no arguments the return value lands on the return address
+            address = ram[frame - 5]
+            result = native(*ram[arg:frame - 5]) & 0xFFFF
+            if os.halted:
+                return None
+            ram[arg] = result
+            ram[SP] = arg + 1
+            ram[THAT] = ram[frame - 1]
+            ram[THIS] = ram[frame - 2]
+            ram[ARG] = ram[frame - 3]
+            ram[LCL] = ram[frame - 4]
+            return address
+        return call
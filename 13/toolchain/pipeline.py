@@ -0,0 +1,139 @@
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from compile.tokenizer import Tokenizer
+from compile.compiler import Compiler
+from translator.commands import Command, build_command, parse_command
+from translator.parser import CommandParser, trim_line
+from translator.writer import Writer
+from assembler.parser import LineParser
+from assembler.main import encode
+from assembler.sourcemap import SourceMap
+from interpreter.jackos import JackOS
+from toolchain.native import functions, os_stubs
+
+
+class Build:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        # (source line, command) per vm file, as the translator takes them
+        self.commands = {}
+        # the files among them compiled from jack in this build
+        self.jack = []
+        self.asm = []
+        self.hack = []
+        # functions defined by the sources, without the os stubs
+        self.functions = set()
+        # source maps keyed by the file they describe, e.g. Main.vm
+        self.maps = {}
+        self.timings = {}
+
+    @property
+    def vm(self) -> Dict[str, List[str]]:
+        return dict(
+            (name, [command.command for _, command in commands])
+            for name, commands in self.commands.items()
+        )
+
+
+class Pipeline:
+    STAGES = ['compile', 'translate', 'assemble']
+
+    def __init__(
+        self,
+        path: Path,
+        pool_strings: bool = False,
+        source_map: bool = False,
+        stub_os: bool = False,
+        cache_top: bool = False,
+        light_frames: bool = False,
+        tail_calls: bool = False,
+        stack_slots: bool = False,
+        loop_locals: int = 0
+    ) -> None:
+        self.path = path
+        self.pool_strings = pool_strings
+        self.source_map = source_map
+        # add entry points for missing os functions, to be run natively
+        self.stub_os = stub_os
+        self.cache_top = cache_top
+        self.light_frames = light_frames
+        self.tail_calls = tail_calls
+        self.stack_slots = stack_slots
+        self.loop_locals = loop_locals
+
+    def sources(self) -> List[Path]:
+        if self.path.is_dir():
+            jack = sorted(self.path.glob('*.jack'))
+            # precompiled vm files (e.g. the OS) are used unless their
+            # jack source is part of the build
+            names = {p.stem for p in jack}
+            vm = [p for p in sorted(self.path.glob('*.vm')) if p.stem not in names]
+            files = jack + vm
+        else:
+            files = [self.path]
+        if not files:
+            raise ValueError('No .jack or .vm files found in {}.'.format(self.path))
+        return files
+
+    def parse(self, lines: List[str], start: int = 0) -> List[Tuple[int, Command]]:
+        commands = []
+        for number, line in enumerate(lines, start):
+            trimmed = trim_line(line)
+            if trimmed != '':
+                commands.append((number, parse_command(trimmed)))
+        return commands
+
+    @contextmanager
+    def stage(self, build: Build, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        build.timings[name] = time.perf_counter() - start
+
+    def run(self) -> Build:
+        build = Build(self.path.stem)
+
+        with self.stage(build, 'compile'):
+            for source in self.sources():
+                if source.suffix == '.jack':
+                    compiler = Compiler(Tokenizer(source), self.pool_strings)
+                    writer = compiler.compile()
+                    build.commands[source.stem] = [
+                        (number, build_command(parts))
+                        for number, parts in enumerate(writer.commands())
+                    ]
+                    build.jack.append(source.stem)
+                    if self.source_map:
+                        build.maps['{}.vm'.format(source.stem)] = writer.source_map(source.name)
+                elif source.suffix == '.vm':
+                    with open(source) as f:
+                        build.commands[source.stem] = self.parse(f.read().splitlines())
+                else:
+                    raise ValueError('{} is neither jack nor vm file.'.format(source))
+            build.functions = functions(build.vm)
+            if self.stub_os:
+                for name, lines in os_stubs(build.vm).items():
+                    commands = build.commands.setdefault(name, [])
+                    commands.extend(self.parse(lines, commands[-1][0] + 1 if commands else 0))
+
+        with self.stage(build, 'translate'):
+            # functions run natively need the frame the traps expect
+            keep = JackOS([]).natives() if self.stub_os else ()
+            writer = Writer(
+                CommandParser(build.commands), self.cache_top, self.light_frames, keep, self.tail_calls,
+                self.stack_slots, self.loop_locals
+            )
+            build.asm = list(writer.lines())
+            if self.source_map:
+                build.maps['{}.asm'.format(build.name)] = writer.source_map
+
+        with self.stage(build, 'assemble'):
+            rom_map = SourceMap() if self.source_map else None
+            asm_name = '{}.asm'.format(build.name)
+            build.hack = list(encode(LineParser(build.asm), rom_map, asm_name))
+            if rom_map is not None:
+                build.maps['{}.hack'.format(build.name)] = rom_map
+
+        return build